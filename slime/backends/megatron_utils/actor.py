@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import ray
 import torch
 import torch.distributed as dist
 
@@ -84,6 +85,8 @@ class MegatronTrainRayActor(TrainRayActor):
 
         self.rollout_engines = None
         self.data_buffer = None
+        # the number of weight updates of the rollout engines, the samples are tagged with the version they come from.
+        self.weight_version = 0
 
         self.rollout_data_postprocess = None
         if self.args.rollout_data_postprocess_path is not None:
@@ -178,7 +181,7 @@ class MegatronTrainRayActor(TrainRayActor):
                 rollout_data=rollout_data,
             )
 
-    def train(self, rollout_id, rollout_data_ref):
+    def train(self, rollout_id, rollout_data_ref, step_offset=0):
         Timer().end("train_wait")
 
         if self.args.debug_rollout_only:
@@ -195,6 +198,11 @@ class MegatronTrainRayActor(TrainRayActor):
         with timer("train"):
             with timer("data_preprocess"):
                 rollout_data = self._get_rollout_data(rollout_data_ref)
+                if "weight_versions" in rollout_data:
+                    # the number of weight updates between generating each sample and training on it.
+                    rollout_data["weight_staleness"] = [
+                        self.weight_version - weight_version for weight_version in rollout_data["weight_versions"]
+                    ]
 
                 # Create data iterator for log_probs and train.
                 (
@@ -244,6 +252,7 @@ class MegatronTrainRayActor(TrainRayActor):
                     self.opt_param_scheduler,
                     train_data_iterator,
                     train_num_microbatches,
+                    step_offset=step_offset,
                 )
 
         # TODO extract to a function during refactor
@@ -294,8 +303,13 @@ class MegatronTrainRayActor(TrainRayActor):
         if self.args.debug_train_only or self.args.debug_rollout_only:
             return
 
+        self.weight_version += 1
+
         torch.cuda.empty_cache()
         self.weight_updator.update_weights()
+        if dist.get_rank() == 0:
+            # before the next rollout starts, so that its samples are tagged with the new version.
+            ray.get(self.data_buffer.set_weight_version.remote(self.weight_version))
         dist.barrier(group=get_gloo_group())
         clear_memory()
         print_memory("after update_weights")
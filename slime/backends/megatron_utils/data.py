@@ -82,11 +82,8 @@ def get_data_iterator(args, model, rollout_data):
             - train_data_iterator: List of DataIterator objects for training.
             - train_num_microbatches: List of number of microbatches for each training step.
     """
-    num_local_samples = (
-        args.rollout_batch_size
-        * args.n_samples_per_prompt
-        // mpu.get_data_parallel_world_size(with_context_parallel=False)
-    )
+    # the whole rollout, or a chunk of it with --rollout-streaming.
+    num_local_samples = len(rollout_data["total_lengths"])
     num_local_gbs = args.global_batch_size // mpu.get_data_parallel_world_size(with_context_parallel=False)
     num_steps_per_rollout = num_local_samples // num_local_gbs
 
@@ -300,7 +297,7 @@ def log_passrate(rollout_id, args, rollout_data):
                 continue
 
             group_size = args.n_samples_per_prompt
-            group_number = args.rollout_batch_size
+            group_number = len(val) // group_size
             assert len(val) == group_number * group_size
             pass_rate_name_list = [2**i for i in range(int(math.log2(group_size)) + 1)]
 
@@ -222,6 +222,13 @@ def compute_advantages_and_returns(args, rollout_data):
             chunk_lengths = [chunk.size(0) for chunk in advantages]
             advantages = list(torch.split(whitened_advs_flat, chunk_lengths))
 
+    if args.max_weight_staleness is not None and "weight_staleness" in rollout_data:
+        # drop the samples of too old weights from the policy gradient, after the whitening so they stay zero.
+        advantages = [
+            torch.zeros_like(advantage) if staleness > args.max_weight_staleness else advantage
+            for advantage, staleness in zip(advantages, rollout_data["weight_staleness"])
+        ]
+
     rollout_data["advantages"] = advantages
     rollout_data["returns"] = returns
 
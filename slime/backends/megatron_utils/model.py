@@ -372,8 +372,11 @@ def should_disable_forward_pre_hook(args):
     return not args.use_custom_fsdp and args.use_distributed_optimizer and args.overlap_param_gather
 
 
-def train(rollout_id, model, optimizer, opt_param_scheduler, data_iterator, num_microbatches):
-    """Training function: run train_step desired number of times."""
+def train(rollout_id, model, optimizer, opt_param_scheduler, data_iterator, num_microbatches, step_offset=0):
+    """Training function: run train_step desired number of times.
+
+    With a streamed chunk of the rollout, only the steps of the chunk are run, starting at `step_offset`.
+    """
     args = get_args()
 
     # Turn on training mode which enables dropout.
@@ -425,13 +428,13 @@ def train(rollout_id, model, optimizer, opt_param_scheduler, data_iterator, num_
     num_steps_per_rollout = args.rollout_batch_size * args.n_samples_per_prompt // args.global_batch_size
 
     # Run training iterations till done.
-    for step_id in range(num_steps_per_rollout):
+    for step_id in range(len(num_microbatches)):
 
         # Run training step.
         loss_dict, grad_norm = train_one_step(
             args,
             rollout_id,
-            step_id,
+            step_offset + step_id,
             data_iterator,
             model,
             optimizer,
@@ -454,7 +457,7 @@ def train(rollout_id, model, optimizer, opt_param_scheduler, data_iterator, num_
             and mpu.get_tensor_model_parallel_rank() == 0
             and mpu.get_pipeline_model_parallel_rank() == mpu.get_pipeline_model_parallel_world_size() - 1
         ):
-            accumulated_step_id = rollout_id * num_steps_per_rollout + step_id
+            accumulated_step_id = rollout_id * num_steps_per_rollout + step_offset + step_id
             log_dict = {
                 f"train/{key}": val.mean().item() if isinstance(val, torch.Tensor) else val
                 for key, val in loss_dict.items()
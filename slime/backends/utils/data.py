@@ -1,10 +1,11 @@
 from typing import Optional
 
+import numpy as np
 import ray
 import torch
-import torch.distributed as dist
 
 from slime.utils.seqlen_balancing import get_seqlen_balanced_partitions
+from slime.utils.types import SampleBatch
 from slime.utils.timer import Timer
 
 
@@ -63,29 +64,17 @@ def get_minimum_num_micro_batch_size(total_lengths, max_tokens_per_gpu, cp_size)
     return len(batches)
 
 
-def process_rollout_data(args, rollout_data_ref, dp_rank, dp_size):
-    rollout_data = {}
-
-    rank = dist.get_rank()
-    if rank == 0:
-        data = ray.get(rollout_data_ref.inner)
-        dist.broadcast_object_list([data], src=0)
-    else:
-        data = [None]
-        dist.broadcast_object_list(data, src=0)
-        data = data[0]
-
+def split_rollout_data(args, data: SampleBatch, dp_size: int) -> list[SampleBatch]:
+    """
+    Normalize the rewards of the rollout and split it into one shard per data parallel rank.
+    """
     # save the unprocessed reward for logging
-    rewards = data["rewards"]
-    if "raw_reward" in data:
-        raw_rewards = data["raw_reward"]
-    else:
-        raw_rewards = rewards
-    rollout_data["raw_reward"] = raw_rewards
+    if data.raw_reward is None:
+        data.raw_reward = data.rewards
 
     if args.advantage_estimator in ["grpo", "gspo", "reinforce_plus_plus_baseline"] and args.rewards_normalization:
         # group norm
-        rewards = torch.tensor([r for r in rewards], dtype=torch.float)
+        rewards = torch.tensor(data.rewards, dtype=torch.float)
         rewards = rewards.reshape(-1, args.n_samples_per_prompt)
         mean = rewards.mean(dim=-1, keepdim=True)
         rewards = rewards - mean
@@ -94,14 +83,9 @@ def process_rollout_data(args, rollout_data_ref, dp_rank, dp_size):
             std = rewards.std(dim=-1, keepdim=True)
             rewards = rewards / (std + 1e-6)
 
-        rewards = rewards.flatten().tolist()
-        data["rewards"] = rewards
-
-    total_lengths = [len(t) for t in data["tokens"]]
-    data["total_lengths"] = total_lengths
+        data.rewards = rewards.flatten().numpy().astype(np.float64)
 
-    # save the seqlen of the whole rollout batch
-    Timer().seq_lens = total_lengths
+    total_lengths = data.total_lengths.tolist()
 
     if args.balance_data:
         # Group-aware partitioning to keep each group together
@@ -128,32 +112,63 @@ def process_rollout_data(args, rollout_data_ref, dp_rank, dp_size):
                 end_idx = start_idx + n_samples_per_prompt
                 trajectory_indices.extend(range(start_idx, end_idx))
             parititions.append(trajectory_indices)
+    else:
+        parititions = [list(range(dp_rank, len(total_lengths), dp_size)) for dp_rank in range(dp_size)]
 
-    def get_partition(val):
-        if args.balance_data:
-            return [val[i] for i in parititions[dp_rank]]
-        else:
-            return val[dp_rank::dp_size]
-
-    for key in [
-        "tokens",
-        "total_lengths",
-        "response_lengths",
-        "rewards",
-        "truncated",
-        "loss_masks",
-        "round_number",
-        "sample_indices",
-    ]:
-        if key not in data:
-            continue
-        val = get_partition(data[key])
-        # move tokens to GPU in advance
-        if key == "tokens":
-            val = [torch.tensor(t, dtype=torch.long, device=torch.cuda.current_device()) for t in val]
-        elif key == "loss_masks":
-            val = [torch.tensor(t, dtype=torch.int, device=torch.cuda.current_device()) for t in val]
-
-        rollout_data[key] = val
+    shards = [data.select(partition) for partition in parititions]
+    # each rank needs the seqlen of the whole rollout batch for the perf logging.
+    for shard in shards:
+        shard.rollout_total_lengths = data.total_lengths
+    return shards
+
+
+def process_rollout_data(args, rollout_data_ref, dp_rank, dp_size):
+    rollout_data = {}
+
+    # the buffer has put one shard per dp rank, only fetch the one of this rank.
+    shard_refs = rollout_data_ref.inner
+    assert len(shard_refs) == dp_size, f"rollout data has {len(shard_refs)} shards, but dp size is {dp_size}"
+    batch: SampleBatch = ray.get(shard_refs[dp_rank])
+
+    # save the seqlen of the whole rollout batch
+    Timer().seq_lens = batch.rollout_total_lengths.tolist()
+
+    response_lengths = batch.response_lengths.tolist()
+    rollout_data["raw_reward"] = batch.raw_reward.tolist()
+    rollout_data["rewards"] = batch.rewards.tolist()
+    rollout_data["total_lengths"] = batch.total_lengths.tolist()
+    rollout_data["response_lengths"] = response_lengths
+    rollout_data["truncated"] = batch.truncated.tolist()
+    rollout_data["sample_indices"] = batch.sample_indices.tolist()
+    if batch.round_number is not None:
+        rollout_data["round_number"] = batch.round_number.tolist()
+    if batch.weight_versions is not None:
+        rollout_data["weight_versions"] = batch.weight_versions.tolist()
+
+    # move tokens and loss masks to GPU in advance, with one copy for each of them.
+    device = torch.cuda.current_device()
+    tokens = torch.from_numpy(batch.tokens).to(device=device, dtype=torch.long)
+    rollout_data["tokens"] = list(tokens.split(rollout_data["total_lengths"]))
+    loss_masks = expand_loss_mask_spans(batch, device)
+    rollout_data["loss_masks"] = list(loss_masks.split(response_lengths))
 
     return rollout_data
+
+
+def expand_loss_mask_spans(batch: SampleBatch, device) -> torch.Tensor:
+    """
+    Expand the loss mask spans of the batch into the concatenated dense loss masks on `device`.
+    """
+    mask_offsets = np.zeros(len(batch) + 1, dtype=np.int64)
+    np.cumsum(batch.response_lengths, out=mask_offsets[1:])
+    # shift the spans of each sample by the start of its loss mask.
+    span_counts = np.diff(batch.loss_mask_span_offsets)
+    spans = batch.loss_mask_spans + np.repeat(mask_offsets[:-1], span_counts)[:, None]
+
+    spans = torch.from_numpy(spans).to(device=device)
+    # +1 at the start of each span and -1 at its end, the prefix sum is the mask.
+    delta = torch.zeros(int(mask_offsets[-1]) + 1, dtype=torch.int, device=device)
+    ones = torch.ones(spans.size(0), dtype=torch.int, device=device)
+    delta.index_add_(0, spans[:, 0], ones)
+    delta.index_add_(0, spans[:, 1], -ones)
+    return delta.cumsum(0, dtype=torch.int)[:-1]
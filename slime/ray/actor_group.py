@@ -106,9 +106,9 @@ class RayTrainGroup:
     def get_rollout_data(self, rollout_id):
         ray.get([actor.get_rollout_data.remote(rollout_id) for actor in self._actor_handlers])
 
-    def async_train(self, rollout_id, rollout_data_ref):
-        """Do one rollout training"""
-        return [actor.train.remote(rollout_id, rollout_data_ref) for actor in self._actor_handlers]
+    def async_train(self, rollout_id, rollout_data_ref, step_offset=0):
+        """Do one rollout training, or the training of a chunk of it starting at step `step_offset`"""
+        return [actor.train.remote(rollout_id, rollout_data_ref, step_offset) for actor in self._actor_handlers]
 
     def async_eval(self, rollout_id, rollout_data_ref):
         """Evaluate the model"""
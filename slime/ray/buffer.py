@@ -1,14 +1,20 @@
 import logging
+import threading
+import time
 from pathlib import Path
 from typing import Union
 
 import ray
 import torch
+import wandb
 
+from slime.backends.utils.data import split_rollout_data
 from slime.utils.misc import load_function
-from slime.utils.types import Sample
+from slime.utils.types import Sample, SampleBatch
+from slime.ray.group_buffer import GroupBuffer
 from slime.ray.rollout_data_source import RolloutDataSource
 from slime.utils.ray_utils import Box
+from slime.utils.rollout_archive import RolloutArchive
 from slime.utils.wandb_utils import init_wandb_secondary
 
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -22,53 +28,93 @@ def pop_first(args, rollout_id, buffer: list[list[Sample]], num_samples: int) ->
     return samples
 
 
-@ray.remote
+# the rollouts are generated one at a time in the generate group, while the control group serves the
+# status, metadata and checkpoint calls during a rollout, in other threads.
+@ray.remote(concurrency_groups={"generate": 1, "control": 4})
 class Buffer:
     def __init__(self, args, wandb_run_id):
         self.args = args
         init_wandb_secondary(args, wandb_run_id)
 
+        # guards the buffer and the data source, which are shared by the generate and the control threads.
+        self.lock = threading.RLock()
+        self.status = {"generating": False}
+        # with --rollout-streaming, the chunks of global_batch_size samples of each rollout, published
+        # while the rollout is generated and fetched by the trainer with `get_chunk`.
+        self.streams: dict[int, dict] = {}
+        self.chunk_ready = threading.Condition(self.lock)
+
         self.data_source = RolloutDataSource(args)
 
-        # a list of sample group.
+        # the sample groups, e.g. of the partial rollouts.
         # each group has n_samples_per_prompt samples, all of them has the same prompt.
-        self.buffer: list[list[Sample]] = []
+        self.buffer = GroupBuffer(
+            policy=args.buffer_policy,
+            max_size=args.buffer_max_size,
+            max_staleness=args.buffer_max_staleness,
+            max_response_len=args.rollout_max_response_len,
+        )
+        # the rollout being generated, set by `generate`.
+        self.rollout_id = 0
+        # the version of the weights of the rollout engines, set by the training actors after each weight update.
+        self.weight_version = 0
         if self.args.buffer_filter_path is None:
             self.buffer_filter = pop_first
         else:
             self.buffer_filter = load_function(self.args.buffer_filter_path)
 
+        # the rollout data is split for the data parallel ranks of the training actors.
+        self.dp_size = args.world_size // (
+            args.tensor_model_parallel_size * args.pipeline_model_parallel_size * args.context_parallel_size
+        )
+
         self.generate_rollout = load_function(self.args.rollout_function_path)
         self.eval_generate_rollout = load_function(self.args.eval_function_path)
         print(f"import {self.args.rollout_function_path} as generate_rollout function.")
         print(f"import {self.args.eval_function_path} as eval_generate_rollout function.")
 
+    @ray.method(concurrency_group="control")
     def get_num_rollout_per_epoch(self):
         assert self.args.rollout_global_dataset
         return len(self.data_source.dataset) // self.args.rollout_batch_size
 
     # TODO simplify remaining logic
+    @ray.method(concurrency_group="control")
     def get_samples(self, num_samples: int) -> list[list[Sample]]:
         """
         Return num_samples samples
         """
+        with self.lock:
+            self.status["num_groups_fetched"] = self.status.get("num_groups_fetched", 0) + num_samples
 
-        samples = self._get_samples_from_buffer(num_samples)
-        num_samples -= len(samples)
+            samples = self._get_samples_from_buffer(num_samples)
+            num_samples -= len(samples)
 
-        if num_samples == 0:
-            return samples
+            if num_samples > 0:
+                samples += self.data_source.get_samples(num_samples=num_samples)
 
-        samples += self.data_source.get_samples(num_samples=num_samples)
-        return samples
+            # tag the samples with the weights that generate them, the partial ones keep the weights they started with.
+            for group in samples:
+                for sample in group:
+                    if not sample.response or "weight_version" not in sample.metadata:
+                        sample.metadata["weight_version"] = self.weight_version
+            return samples
 
     def _get_samples_from_buffer(self, num_samples: int) -> list[list[Sample]]:
         if len(self.buffer) == 0 or num_samples == 0:
             return []
 
-        samples = self.buffer_filter(self.args, self.rollout_id, self.buffer, num_samples)
+        self.buffer.evict_stale(self.rollout_id)
+        if self.args.buffer_filter_path is None:
+            return self.buffer.pop(num_samples)
+
+        # the custom filters select from a list, the groups they leave are put back.
+        groups = self.buffer.pop(len(self.buffer))
+        samples = self.buffer_filter(self.args, self.rollout_id, groups, num_samples)
+        self.buffer.extend(groups, self.rollout_id)
         return samples
 
+    @ray.method(concurrency_group="control")
     def add_samples(self, samples: list[list[Sample]]):
         """
         Add a sample group to buffer.
@@ -77,49 +123,189 @@ class Buffer:
             return
         assert isinstance(samples, list), f"samples must be a list, got {type(samples)}"
         assert isinstance(samples[0], list), f"the elements of samples must be list, got {type(samples[0])}"
-        for i in range(0, len(samples)):
-            assert (
-                len(samples[i]) == self.args.n_samples_per_prompt
-            ), f"the length of the elements of samples must be equal to n_samples_per_prompt, got {len(samples[i])} != {self.args.n_samples_per_prompt}"
-            group = samples[i]  # type: ignore
-            self.buffer.append(group)
-
+        with self.lock:
+            for i in range(0, len(samples)):
+                assert (
+                    len(samples[i]) == self.args.n_samples_per_prompt
+                ), f"the length of the elements of samples must be equal to n_samples_per_prompt, got {len(samples[i])} != {self.args.n_samples_per_prompt}"
+                group = samples[i]  # type: ignore
+                self.buffer.append(group, self.rollout_id)
+
+    @ray.method(concurrency_group="generate")
     def generate(self, rollout_id, evaluation=False):
-        self.rollout_id = rollout_id
+        streaming = self.args.rollout_streaming and not evaluation
+        with self.lock:
+            self.rollout_id = rollout_id
+            self.status = {
+                "rollout_id": rollout_id,
+                "evaluation": evaluation,
+                "generating": True,
+                "start_time": time.time(),
+                "num_groups_fetched": 0,
+            }
+            if streaming:
+                self.streams[rollout_id] = {
+                    "chunks": {},
+                    "num_chunks": 0,
+                    "num_samples": 0,
+                    "groups": [],
+                    # the index of the first sample of each published group, in the order they are published.
+                    "published": [],
+                    "done": False,
+                }
+        try:
+            return self._generate(rollout_id, evaluation)
+        except Exception as e:
+            if streaming:
+                # wake up the trainer waiting for the chunks of this rollout.
+                with self.lock:
+                    self.streams[rollout_id]["error"] = e
+                    self.chunk_ready.notify_all()
+            raise
+        finally:
+            self.status["generating"] = False
+            self.status["end_time"] = time.time()
+
+    def _generate(self, rollout_id, evaluation=False):
+        streaming = self.args.rollout_streaming and not evaluation
         if self.args.debug_train_only and evaluation:
             # if debug train only, we don't generate evaluation data
             return Box(ray.put({}))
 
         if not evaluation and self.args.load_debug_rollout_data:
-            data = torch.load(
-                open(self.args.load_debug_rollout_data.format(rollout_id=rollout_id), "rb"),
-            )["samples"]
-            data = [Sample.from_dict(sample) for sample in data]
+            path = self.args.load_debug_rollout_data.format(rollout_id=rollout_id)
+            if RolloutArchive.is_archive(path):
+                # the archive is already in the format of the training data.
+                data = RolloutArchive(path).to_sample_batch()
+            else:
+                data = torch.load(open(path, "rb"))["samples"]
+                data = [Sample.from_dict(sample) for sample in data]
         else:
             generate_rollout = self.eval_generate_rollout if evaluation else self.generate_rollout
             data = generate_rollout(self.args, rollout_id, self, evaluation=evaluation)
+            if streaming and isinstance(data[0], list):
+                # the published groups come first, in the order of their chunks.
+                with self.lock:
+                    order = {index: i for i, index in enumerate(self.streams[rollout_id]["published"])}
+                data = sorted(data, key=lambda group: order.get(group[0].index, len(order)))
+            if not evaluation and (self.args.partial_rollout or len(self.buffer) > 0):
+                with self.lock:
+                    metrics = self.buffer.get_metrics(rollout_id)
+                self.log_rollout_metrics(rollout_id, {f"buffer/{key}": value for key, value in metrics.items()})
             # flatten the data if it is a list of lists
             if not evaluation and isinstance(data[0], list):
                 data = sum(data, [])
 
         # TODO to be refactored (originally Buffer._set_data)
         if not evaluation:
-            # TODO extract to a function during refactor
-            if (path_template := self.args.save_debug_rollout_data) is not None:
-                path = Path(path_template.format(rollout_id=self.rollout_id))
-                print(f"Save debug rollout data to {path}")
-                path.parent.mkdir(parents=True, exist_ok=True)
-                torch.save(
-                    dict(
-                        rollout_id=self.rollout_id,
-                        samples=[sample.to_dict() for sample in data],
-                    ),
-                    path,
-                )
-            data = self._convert_samples_to_train_data(data)
+            if isinstance(data, list):
+                # TODO extract to a function during refactor
+                if (path_template := self.args.save_debug_rollout_data) is not None:
+                    path = Path(path_template.format(rollout_id=self.rollout_id))
+                    print(f"Save debug rollout data to {path}")
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    if path.suffix == ".pt":
+                        torch.save(
+                            dict(
+                                rollout_id=self.rollout_id,
+                                samples=[sample.to_dict() for sample in data],
+                            ),
+                            path,
+                        )
+                    else:
+                        rewards = [sample.get_reward_value(self.args) for sample in data]
+                        RolloutArchive.write(path, data, rewards, rollout_id=self.rollout_id)
+                data = self._convert_samples_to_train_data(data)
+            if self.args.rollout_streaming:
+                self._finish_stream(rollout_id, data)
+                # the trainer fetches the data chunk by chunk with `get_chunk`.
+                return Box(None)
+            # put one object per dp rank, so that each rank only fetches its own shard.
+            return Box([ray.put(shard) for shard in split_rollout_data(self.args, data, self.dp_size)])
 
         return Box(ray.put(data))
 
+    def _publish_chunk(self, rollout_id, data: SampleBatch):
+        stream = self.streams[rollout_id]
+        # the rewards are normalized within the groups, which are never split across chunks.
+        chunk = Box([ray.put(shard) for shard in split_rollout_data(self.args, data, self.dp_size)])
+        stream["chunks"][stream["num_chunks"]] = chunk
+        stream["num_chunks"] += 1
+        stream["num_samples"] += len(data)
+        self.chunk_ready.notify_all()
+
+    @ray.method(concurrency_group="control")
+    def publish_groups(self, groups: list[list[Sample]]):
+        """
+        Publish the finished groups of the rollout in flight, with --rollout-streaming.
+
+        A chunk is published each time global_batch_size samples are finished. The groups returned by the
+        rollout function are reordered to the order they are published in, e.g. from several rollout workers.
+        """
+        if not self.args.rollout_streaming:
+            return
+        with self.lock:
+            stream = self.streams[self.rollout_id]
+            stream["groups"].extend(groups)
+            stream["published"].extend(group[0].index for group in groups)
+            groups_per_chunk = self.args.global_batch_size // self.args.n_samples_per_prompt
+            while len(stream["groups"]) >= groups_per_chunk:
+                chunk_groups = stream["groups"][:groups_per_chunk]
+                del stream["groups"][:groups_per_chunk]
+                self._publish_chunk(self.rollout_id, self._convert_samples_to_train_data(sum(chunk_groups, [])))
+
+    def _finish_stream(self, rollout_id, data: SampleBatch):
+        # publish the rest of the rollout, e.g. all of it if the rollout function does not publish the groups.
+        with self.lock:
+            stream = self.streams[rollout_id]
+            num_samples = len(data)
+            for start in range(stream["num_samples"], num_samples, self.args.global_batch_size):
+                end = min(start + self.args.global_batch_size, num_samples)
+                self._publish_chunk(rollout_id, data.select(list(range(start, end))))
+            stream["groups"] = []
+            stream["done"] = True
+            if not stream["chunks"]:
+                # all the chunks are already fetched.
+                del self.streams[rollout_id]
+            self.chunk_ready.notify_all()
+
+    @ray.method(concurrency_group="control")
+    def get_chunk(self, rollout_id, chunk_id) -> Box:
+        """
+        Wait for the chunk `chunk_id` of the rollout and return it, in the format of the training data.
+        """
+        with self.lock:
+            while True:
+                stream = self.streams.get(rollout_id)
+                if stream is not None:
+                    if chunk_id in stream["chunks"]:
+                        chunk = stream["chunks"].pop(chunk_id)
+                        if stream["done"] and not stream["chunks"]:
+                            del self.streams[rollout_id]
+                        return chunk
+                    if "error" in stream:
+                        raise RuntimeError(f"Rollout {rollout_id} failed") from stream["error"]
+                    assert not stream["done"], f"Rollout {rollout_id} only has {stream['num_chunks']} chunks."
+                self.chunk_ready.wait(timeout=1)
+
+    @ray.method(concurrency_group="control")
+    def log_rollout_metrics(self, rollout_id, metrics: dict):
+        """
+        Log the metrics of the rollout generation, e.g. from the rollout function, under `rollout/`.
+        """
+        log_dict = {f"rollout/{key}": value for key, value in metrics.items()}
+        print(f"rollout {rollout_id}: {log_dict}")
+        if self.args.use_wandb:
+            log_dict["rollout/step"] = (
+                rollout_id
+                if not self.args.wandb_always_use_train_step
+                else rollout_id
+                * self.args.rollout_batch_size
+                * self.args.n_samples_per_prompt
+                // self.args.global_batch_size
+            )
+            wandb.log(log_dict)
+
     def get_data(self, rollout_id, evaluation=False):
         data_pool = self.train_data_pool if not evaluation else self.eval_data_pool
         assert rollout_id in data_pool
@@ -127,55 +313,58 @@ class Buffer:
         del data_pool[rollout_id]
         return data
 
-    def _convert_samples_to_train_data(self, samples: Union[list[Sample], list[list[Sample]]]):
+    def _convert_samples_to_train_data(self, samples: Union[list[Sample], list[list[Sample]]]) -> SampleBatch:
         """
         Convert inference generated samples to training data.
         """
-        train_data = {
-            "tokens": [sample.tokens for sample in samples],
-            "response_lengths": [sample.response_length for sample in samples],
-            # some reward model, e.g. remote rm, may return multiple rewards,
-            # we could use key to select the reward.
-            "rewards": [sample.get_reward_value(self.args) for sample in samples],
-            "truncated": [1 if sample.status == Sample.Status.TRUNCATED else 0 for sample in samples],
-            "sample_indices": [sample.index for sample in samples],
-        }
-
-        # loss mask
-        # TODO: compress the loss mask
-        loss_masks = []
-        for sample in samples:
-            # always instantiate loss_mask if not provided
-            if sample.loss_mask is None:
-                sample.loss_mask = [1] * sample.response_length
-            assert (
-                len(sample.loss_mask) == sample.response_length
-            ), f"loss mask length {len(sample.loss_mask)} != response length {sample.response_length}"
-            loss_masks.append(sample.loss_mask)
-        train_data["loss_masks"] = loss_masks
-
-        # overwriting the raw reward
-        if samples[0].metadata and "raw_reward" in samples[0].metadata:
-            train_data["raw_reward"] = [sample.metadata["raw_reward"] for sample in samples]
-
-        # For rollout buffer
-        if samples[0].metadata and "round_number" in samples[0].metadata:
-            train_data["round_number"] = [sample.metadata["round_number"] for sample in samples]
-        return train_data
+        # some reward model, e.g. remote rm, may return multiple rewards,
+        # we could use key to select the reward.
+        rewards = [sample.get_reward_value(self.args) for sample in samples]
+        return SampleBatch.from_samples(samples, rewards)
 
     # TODO remove
+    @ray.method(concurrency_group="control")
     def update_metadata(self, metadata: dict):
-        self.data_source.metadata.update(metadata)
+        with self.lock:
+            self.data_source.metadata.update(metadata)
 
     # TODO remove
+    @ray.method(concurrency_group="control")
     def get_metadata(self):
-        return self.data_source.metadata
+        with self.lock:
+            return dict(self.data_source.metadata)
 
+    @ray.method(concurrency_group="control")
     def get_buffer_length(self):
-        return len(self.buffer)
+        with self.lock:
+            return len(self.buffer)
+
+    @ray.method(concurrency_group="control")
+    def set_weight_version(self, weight_version: int):
+        with self.lock:
+            self.weight_version = weight_version
 
+    @ray.method(concurrency_group="control")
+    def get_status(self) -> dict:
+        """
+        Return the progress of the rollout in flight, or of the last one, without waiting for it.
+        """
+        with self.lock:
+            status = dict(self.status)
+            if status["generating"]:
+                status["elapsed"] = time.time() - status["start_time"]
+            status["buffer_length"] = len(self.buffer)
+            status["weight_version"] = self.weight_version
+            status["epoch_id"] = self.data_source.epoch_id
+            status["sample_offset"] = self.data_source.sample_offset
+            return status
+
+    @ray.method(concurrency_group="control")
     def save(self, rollout_id):
-        self.data_source.save(rollout_id)
+        with self.lock:
+            self.data_source.save(rollout_id)
 
+    @ray.method(concurrency_group="control")
     def load(self, rollout_id=None):
-        self.data_source.load(rollout_id)
+        with self.lock:
+            self.data_source.load(rollout_id)
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+from collections import deque
+from typing import Iterator, Optional
+
+from slime.utils.types import Sample
+
+__all__ = ["GroupBuffer"]
+
+
+class GroupBuffer:
+    """
+    The buffer of the sample groups of the partial rollouts, with O(1) or O(log n) pops.
+
+    The groups are popped in the order of the policy:
+        - fifo: in the order they are added.
+        - oldest: the group with the smallest start rollout id first, i.e. the most off-policy.
+        - shortest_remaining: the group with the fewest tokens left to generate first.
+
+    The start rollout id of a group is the rollout its responses were first generated in
+    (`sample.metadata["start_rollout_id"]`), or the rollout it was added in if it has no response yet.
+    The groups that are more than `max_staleness` rollouts old are evicted, and the oldest groups are
+    evicted when there are more than `max_size` groups.
+    """
+
+    POLICIES = ["fifo", "oldest", "shortest_remaining"]
+
+    def __init__(
+        self,
+        policy: str = "fifo",
+        max_size: Optional[int] = None,
+        max_staleness: Optional[int] = None,
+        max_response_len: Optional[int] = None,
+    ):
+        assert policy in GroupBuffer.POLICIES, f"Unknown buffer policy {policy}, should be one of {GroupBuffer.POLICIES}"
+        assert policy != "shortest_remaining" or max_response_len is not None
+        self.policy = policy
+        self.max_size = max_size
+        self.max_staleness = max_staleness
+        self.max_response_len = max_response_len
+
+        # the entries are [key, seq, start_rollout_id, group, alive], the unique seq breaks the ties,
+        # so the groups are never compared. A popped or evicted entry is marked as not alive,
+        # and skipped when it is reached in the other structure.
+        self._queue = deque() if policy == "fifo" else []
+        self._by_age = []
+        self._seq = itertools.count()
+        self._size = 0
+        self._num_samples = 0
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.num_evicted_stale = 0
+        self.num_evicted_overflow = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self) -> Iterator[list[Sample]]:
+        for entry in self._by_age:
+            if entry[4]:
+                yield entry[3]
+
+    def _get_key(self, group: list[Sample], start_rollout_id: int):
+        if self.policy == "oldest":
+            return start_rollout_id
+        if self.policy == "shortest_remaining":
+            return sum(
+                max(self.max_response_len - sample.response_length, 0)
+                for sample in group
+                if sample.status != Sample.Status.COMPLETED and sample.status != Sample.Status.TRUNCATED
+            )
+        return 0
+
+    def append(self, group: list[Sample], rollout_id: int):
+        start_rollout_id = min(sample.metadata.get("start_rollout_id", rollout_id) for sample in group)
+        seq = next(self._seq)
+        entry = [self._get_key(group, start_rollout_id), seq, start_rollout_id, group, True]
+        if self.policy == "fifo":
+            self._queue.append(entry)
+        else:
+            heapq.heappush(self._queue, entry)
+        heapq.heappush(self._by_age, (start_rollout_id, seq, entry))
+        self._size += 1
+        self._num_samples += len(group)
+
+        while self.max_size is not None and self._size > self.max_size:
+            self._evict_oldest()
+            self.num_evicted_overflow += 1
+        self._maybe_compact()
+
+    def extend(self, groups: list[list[Sample]], rollout_id: int):
+        for group in groups:
+            self.append(group, rollout_id)
+
+    def _remove(self, entry):
+        entry[4] = False
+        self._size -= 1
+        self._num_samples -= len(entry[3])
+
+    def _evict_oldest(self):
+        while True:
+            _, _, entry = heapq.heappop(self._by_age)
+            if entry[4]:
+                self._remove(entry)
+                return
+
+    def _popleft(self) -> list[Sample]:
+        while True:
+            entry = self._queue.popleft() if self.policy == "fifo" else heapq.heappop(self._queue)
+            if entry[4]:
+                self._remove(entry)
+                return entry[3]
+
+    def pop(self, num_groups: int) -> list[list[Sample]]:
+        """
+        Pop at most `num_groups` groups in the order of the policy.
+        """
+        groups = [self._popleft() for _ in range(min(num_groups, self._size))]
+        self._maybe_compact()
+        return groups
+
+    def evict_stale(self, rollout_id: int):
+        """
+        Evict the groups that are more than `max_staleness` rollouts older than `rollout_id`.
+        """
+        if self.max_staleness is None:
+            return
+        while self._by_age and self._by_age[0][0] < rollout_id - self.max_staleness:
+            _, _, entry = heapq.heappop(self._by_age)
+            if entry[4]:
+                self._remove(entry)
+                self.num_evicted_stale += 1
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        # drop the dead entries once they outnumber the live ones, so the memory stays bounded by the live groups.
+        if len(self._queue) + len(self._by_age) <= 4 * self._size + 64:
+            return
+        if self.policy == "fifo":
+            self._queue = deque(entry for entry in self._queue if entry[4])
+        else:
+            self._queue = [entry for entry in self._queue if entry[4]]
+            heapq.heapify(self._queue)
+        self._by_age = [item for item in self._by_age if item[2][4]]
+        heapq.heapify(self._by_age)
+
+    def get_metrics(self, rollout_id: int, reset=True) -> dict:
+        """
+        Return the occupancy of the buffer, and the number of groups evicted since the last reset.
+        """
+        ages = [rollout_id - start_rollout_id for start_rollout_id, _, entry in self._by_age if entry[4]]
+        metrics = {
+            "num_groups": self._size,
+            "num_samples": self._num_samples,
+            "evicted_stale": self.num_evicted_stale,
+            "evicted_overflow": self.num_evicted_overflow,
+        }
+        if ages:
+            metrics["mean_age"] = sum(ages) / len(ages)
+            metrics["max_age"] = max(ages)
+        if reset:
+            self._reset_metrics()
+        return metrics
@@ -64,7 +64,7 @@ class TrainRayActor(RayActor):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def train(self, rollout_id, rollout_data_ref):
+    def train(self, rollout_id, rollout_data_ref, step_offset=0):
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -1,9 +1,9 @@
-import copy
 import os
 from pathlib import Path
 
 import torch
 from slime.utils.data import Dataset
+from slime.utils.types import Sample
 from transformers import AutoTokenizer
 
 
@@ -35,6 +35,8 @@ class RolloutDataSource:
                 tool_key=args.tool_key,
                 apply_chat_template=args.apply_chat_template,
                 seed=args.rollout_seed,
+                num_workers=args.prompt_filter_num_workers,
+                cache_dir=args.prompt_cache_dir,
             )
             if self.args.rollout_shuffle:
                 self.dataset.shuffle(self.epoch_id)
@@ -47,21 +49,20 @@ class RolloutDataSource:
         # TODO unify the two branches
         if self.dataset is not None:
             if self.sample_offset + num_samples <= len(self.dataset):
-                prompt_samples = self.dataset.samples[self.sample_offset : self.sample_offset + num_samples]
+                prompt_samples = self.dataset[self.sample_offset : self.sample_offset + num_samples]
                 self.sample_offset += num_samples
             else:
-                prompt_samples = self.dataset.samples[self.sample_offset :]
+                prompt_samples = self.dataset[self.sample_offset :]
                 num_samples -= len(prompt_samples)
                 self.epoch_id += 1
                 if self.args.rollout_shuffle:
                     self.dataset.shuffle(self.epoch_id)
-                prompt_samples += self.dataset.samples[:num_samples]
+                prompt_samples += self.dataset[:num_samples]
                 self.sample_offset = num_samples
             for prompt_sample in prompt_samples:
                 group = []
                 for _ in range(self.args.n_samples_per_prompt):
-                    sample = copy.deepcopy(prompt_sample)
-                    sample.index = self.sample_index
+                    sample = prompt_sample.clone(index=self.sample_index)
                     self.sample_index += 1
                     group.append(sample)
                 samples.append(group)
@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from slime.utils.http_utils import get
+from slime.utils.types import Sample
+
+__all__ = ["AffinityRouter"]
+
+
+class AffinityRouter:
+    """
+    Route all the samples of a group to the same sglang engine.
+
+    The samples of a group share the same prompt, so sending them to one engine lets the prompt be
+    prefilled once and reused from the radix cache. The engine of a group is recorded in the metadata
+    of its samples, so that the continuations of the samples in partial rollout go to the same engine.
+    New groups are sent to the engine with the fewest outstanding requests.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = asyncio.Lock()
+        self.reset()
+
+    def reset(self):
+        # the engine urls are fetched from the router on the first use.
+        self.urls = None
+        self.outstanding: dict[str, int] = {}
+
+    async def _get_urls(self) -> list[str]:
+        async with self.lock:
+            if self.urls is None:
+                response = await get(
+                    f"http://{self.args.sglang_router_ip}:{self.args.sglang_router_port}/list_workers",
+                    use_http2=self.args.use_http2,
+                )
+                self.urls = response["urls"]
+                self.outstanding = {url: 0 for url in self.urls}
+        return self.urls
+
+    @asynccontextmanager
+    async def pin(self, group: list[Sample]):
+        """
+        Pin the unfinished samples of the group to one engine during the context.
+        """
+        samples = [sample for sample in group if sample.status in (Sample.Status.PENDING, Sample.Status.ABORTED)]
+        if not samples:
+            yield
+            return
+
+        await self._get_urls()
+        # keep the engine of the partial samples if it is still serving.
+        pinned_urls = [sample.metadata.get("engine_url") for sample in samples]
+        url = next((url for url in pinned_urls if url in self.outstanding), None)
+        if url is None:
+            url = min(self.outstanding, key=self.outstanding.get)
+        for sample in samples:
+            sample.metadata["engine_url"] = url
+
+        outstanding = self.outstanding
+        outstanding[url] += len(samples)
+        try:
+            yield
+        finally:
+            # the counts may have been reset for the next rollout.
+            if url in outstanding:
+                outstanding[url] -= len(samples)
@@ -0,0 +1,81 @@
+import numpy as np
+
+from slime.utils.types import Sample
+
+__all__ = ["LengthPredictor"]
+
+
+class LengthPredictor:
+    """
+    Predict the response length of a prompt group from the previous rollouts.
+
+    The prediction is the moving average of the mean response length of the previous groups with the same
+    prompt. For the prompts not seen yet, it falls back to the average of the prompts of similar length
+    (bucketed by powers of 2), and then to the average of all prompts.
+    """
+
+    def __init__(self, momentum: float = 0.5):
+        self.momentum = momentum
+        self.prompt_lengths: dict[int, float] = {}
+        self.bucket_lengths: dict[int, float] = {}
+        self.global_length = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.predicted = []
+        self.actual = []
+
+    @staticmethod
+    def _get_prompt_key_and_bucket(group: list[Sample]):
+        sample = group[0]
+        prompt_tokens = sample.tokens[: len(sample.tokens) - sample.response_length]
+        if prompt_tokens:
+            return hash(tuple(prompt_tokens)), len(prompt_tokens).bit_length()
+        # the prompt is not tokenized yet, e.g. a list of messages without chat template.
+        prompt = str(sample.prompt)
+        return hash(prompt), len(prompt).bit_length()
+
+    def _update(self, lengths: dict, key, value: float):
+        lengths[key] = value if key not in lengths else self.momentum * lengths[key] + (1 - self.momentum) * value
+
+    def predict(self, group: list[Sample]) -> float:
+        key, bucket = self._get_prompt_key_and_bucket(group)
+        if key in self.prompt_lengths:
+            return self.prompt_lengths[key]
+        if bucket in self.bucket_lengths:
+            return self.bucket_lengths[bucket]
+        return self.global_length if self.global_length is not None else 0.0
+
+    def update(self, group: list[Sample], predicted: float):
+        """
+        Update the history with a finished group, whose length was predicted as `predicted`.
+        """
+        if any(sample.status == Sample.Status.ABORTED for sample in group):
+            return
+        length = sum(sample.response_length for sample in group) / len(group)
+        key, bucket = self._get_prompt_key_and_bucket(group)
+        self._update(self.prompt_lengths, key, length)
+        self._update(self.bucket_lengths, bucket, length)
+        self.global_length = (
+            length
+            if self.global_length is None
+            else self.momentum * self.global_length + (1 - self.momentum) * length
+        )
+        self.predicted.append(predicted)
+        self.actual.append(length)
+
+    def get_metrics(self, reset=True) -> dict:
+        """
+        Return the quality of the predictions of the groups finished since the last reset.
+        """
+        metrics = {}
+        if self.actual:
+            predicted, actual = np.array(self.predicted), np.array(self.actual)
+            metrics["predicted_response_length"] = float(predicted.mean())
+            metrics["actual_response_length"] = float(actual.mean())
+            metrics["response_length_abs_error"] = float(np.abs(predicted - actual).mean())
+            if len(actual) > 1 and predicted.std() > 0 and actual.std() > 0:
+                metrics["response_length_correlation"] = float(np.corrcoef(predicted, actual)[0, 1])
+        if reset:
+            self._reset_metrics()
+        return metrics
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from slime.utils.types import Sample
+
+__all__ = ["RequestTracer"]
+
+
+class RequestTracer:
+    """
+    Record the time each sample of a rollout spends in each phase of `generate_and_rm`.
+
+    The phases are:
+        - semaphore: waiting for a slot of the concurrency limit.
+        - tokenize: tokenizing the prompt, when the data source has not.
+        - http: the generation request, from sending it to receiving the response.
+        - engine: the part of the request spent in sglang, if reported in the response.
+        - postprocess: applying the response to the sample.
+        - custom_generate: the custom generate function, instead of the phases above.
+        - rm: the reward model.
+    """
+
+    PHASES = ["semaphore", "tokenize", "http", "engine", "postprocess", "custom_generate", "rm", "total"]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.traces: dict = {}
+
+    def add(self, sample: Sample, phase: str, seconds: float):
+        trace = self.traces.setdefault(sample.index, {"index": sample.index})
+        trace[phase] = trace.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def trace(self, sample: Sample, phase: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(sample, phase, time.perf_counter() - start_time)
+
+    def finish(self, sample: Sample):
+        trace = self.traces.setdefault(sample.index, {"index": sample.index})
+        trace["status"] = sample.status.value
+        trace["response_length"] = sample.response_length
+
+    def get_metrics(self) -> dict:
+        """
+        Return the p50/p90/p99 and the total of each phase over the traced samples.
+        """
+        metrics = {}
+        for phase in RequestTracer.PHASES:
+            values = np.array([trace[phase] for trace in self.traces.values() if phase in trace])
+            if len(values) == 0:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            metrics[f"{phase}_p50"] = float(p50)
+            metrics[f"{phase}_p90"] = float(p90)
+            metrics[f"{phase}_p99"] = float(p99)
+            metrics[f"{phase}_total"] = float(values.sum())
+        return metrics
+
+    def dump(self, path):
+        """
+        Dump the raw traces as jsonl, one line per sample.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for trace in self.traces.values():
+                f.write(json.dumps(trace, default=str) + "\n")
@@ -1,7 +1,9 @@
 import asyncio
-from typing import Union
-
-import aiohttp
+import copy
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
 
 from slime.utils.misc import load_function
 from slime.utils.types import Sample
@@ -11,38 +13,38 @@ from .f1 import f1_score
 from .math_dapo_utils import compute_score as compute_score_dapo
 from .math_utils import extract_answer as extract_boxed_answer
 from .math_utils import grade_answer_verl
+from .remote_rm import RemoteRMClient
+from .reward_cache import RewardCache, get_reward_cache_key
 
+_REMOTE_RM_CLIENT = None
 
-async def remote_rm(args, sample: Sample):
-    payload = {
-        "prompt": sample.prompt,
-        "response": sample.response,
-        "label": sample.label,
-    }
-    session_kwargs = {}
-    async with aiohttp.ClientSession(**session_kwargs) as session:
-        async with session.post(args.rm_url, json=payload) as resp:
-            resp.raise_for_status()
-            return await resp.json()
 
+def get_remote_rm_client(args) -> RemoteRMClient:
+    global _REMOTE_RM_CLIENT
+    if _REMOTE_RM_CLIENT is None:
+        _REMOTE_RM_CLIENT = RemoteRMClient(
+            args.rm_url,
+            batch_url=args.rm_batch_url,
+            max_batch_size=args.rm_max_batch_size,
+            batch_window=args.rm_batch_window,
+            max_connections=args.rm_max_connections,
+        )
+    return _REMOTE_RM_CLIENT
 
-async def async_rm(args, sample: Sample, **kwargs):
-    if args.custom_rm_path is not None:
-        rm_function = load_function(args.custom_rm_path)
-        return await rm_function(args, sample, **kwargs)
 
-    rm_type = args.rm_type
-    response = sample.response
-    label = sample.label
+async def remote_rm(args, sample: Sample):
+    return await get_remote_rm_client(args).score(sample)
+
+
+def rule_based_rm(rm_type: str, response: str, label) -> Union[int, float]:
+    """
+    Compute the reward of a rule-based reward model synchronously.
+    """
     if rm_type.startswith("boxed_"):
         response = extract_boxed_answer(response) or ""
         rm_type = rm_type[len("boxed_") :]
 
-    # This function is intended for remote or time-consuming reward model evaluation.
-    # Implement the actual logic as needed.
-    if rm_type == "remote_rm":
-        return await remote_rm(args, sample)
-    elif rm_type == "deepscaler":
+    if rm_type == "deepscaler":
         return get_deepscaler_rule_based_reward(response, label)
     elif rm_type == "dapo":
         return compute_score_dapo(response, label)
@@ -51,7 +53,90 @@ async def async_rm(args, sample: Sample, **kwargs):
     elif rm_type == "f1":
         return f1_score(response, label)[0]
     else:
-        raise NotImplementedError(f"Rule-based RM for {type} is not implemented.")
+        raise NotImplementedError(f"Rule-based RM for {rm_type} is not implemented.")
+
+
+def _handle_rm_timeout(signum, frame):
+    raise TimeoutError
+
+
+def _rule_based_rm_with_timeout(rm_type: str, response: str, label, timeout: float):
+    # run in the main thread of a worker process, so the timer signal can interrupt the grader.
+    signal.signal(signal.SIGALRM, _handle_rm_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return rule_based_rm(rm_type, response, label)
+    except TimeoutError:
+        print(f"Rule-based RM {rm_type} timed out after {timeout}s, use 0 as the reward.")
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+_RM_EXECUTOR = None
+_REWARD_CACHE = None
+
+
+def get_rm_executor(args) -> ProcessPoolExecutor:
+    global _RM_EXECUTOR
+    if _RM_EXECUTOR is None:
+        _RM_EXECUTOR = ProcessPoolExecutor(
+            max_workers=args.rm_num_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _RM_EXECUTOR
+
+
+def get_reward_cache(args) -> Optional[RewardCache]:
+    global _REWARD_CACHE
+    if _REWARD_CACHE is None and args.rm_cache_size > 0:
+        _REWARD_CACHE = RewardCache(args.rm_cache_size, path=args.rm_cache_path)
+    return _REWARD_CACHE
+
+
+async def async_rule_based_rm(args, rm_type: str, response: str, label):
+    """
+    Compute the reward of a rule-based reward model, None if it timed out.
+    """
+    if args.rm_num_workers == 0:
+        return rule_based_rm(rm_type, response, label)
+
+    # grade in the process pool, so that the event loop keeps handling the generation responses.
+    future = asyncio.get_running_loop().run_in_executor(
+        get_rm_executor(args), _rule_based_rm_with_timeout, rm_type, response, label, args.rm_timeout
+    )
+    try:
+        # in case the grader is stuck in code that the timer signal cannot interrupt.
+        return await asyncio.wait_for(future, timeout=args.rm_timeout + 10)
+    except asyncio.TimeoutError:
+        print(f"Rule-based RM {rm_type} did not return after {args.rm_timeout + 10}s, use 0 as the reward.")
+        return None
+
+
+async def async_rm(args, sample: Sample, **kwargs):
+    if args.custom_rm_path is not None:
+        rm_function = load_function(args.custom_rm_path)
+        return await rm_function(args, sample, **kwargs)
+
+    rm_type = args.rm_type
+
+    # This function is intended for remote or time-consuming reward model evaluation.
+    # Implement the actual logic as needed.
+    if rm_type == "remote_rm":
+        return await remote_rm(args, sample)
+
+    # the responses with the same extracted answer for the same label share the reward.
+    cache = get_reward_cache(args)
+    key = get_reward_cache_key(rm_type, sample.response, sample.label) if cache is not None else None
+    if key is not None and (reward := cache.get(key)) is not None:
+        return copy.copy(reward)
+
+    reward = await async_rule_based_rm(args, rm_type, sample.response, sample.label)
+    if reward is None:
+        # do not cache the timeouts, they may succeed next time.
+        return 0
+    if key is not None:
+        cache.put(key, copy.copy(reward))
+    return reward
 
 
 async def batched_async_rm(
@@ -63,6 +148,8 @@ async def batched_async_rm(
         # Ensure the custom reward function is implemented in batch mode
         rm_function = load_function(args.custom_rm_path)
         return await rm_function(args, samples, **kwargs)
+    if args.rm_type == "remote_rm":
+        return await get_remote_rm_client(args).score_batch(samples)
     tasks = [async_rm(args, sample, **kwargs) for sample in samples]
     rewards = await asyncio.gather(*tasks)
     return rewards
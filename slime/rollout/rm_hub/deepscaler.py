@@ -1,4 +1,4 @@
-from .math_utils import extract_answer, grade_answer_mathd, grade_answer_sympy
+from .math_utils import extract_answer, extract_ground_truth, grade_answer_mathd, grade_answer_sympy
 
 
 def get_deepscaler_rule_based_reward(response, label):
@@ -22,13 +22,9 @@ def get_deepscaler_rule_based_reward(response, label):
     # Process each ground truth
     processed_ground_truths = []
     for truth in ground_truths:
-        truth = str(truth)
-        if "\\boxed" in truth:
-            processed_truth = extract_answer(truth)
-            if processed_truth is not None:
-                processed_ground_truths.append(processed_truth)
-        else:
-            processed_ground_truths.append(truth)
+        processed_truth = extract_ground_truth(str(truth))
+        if processed_truth is not None:
+            processed_ground_truths.append(processed_truth)
 
     if not processed_ground_truths:
         return 0
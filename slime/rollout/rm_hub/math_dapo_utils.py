@@ -15,6 +15,7 @@
 
 import re
 import signal
+from functools import lru_cache
 from typing import Optional
 
 
@@ -180,6 +181,22 @@ def normalize_final_answer(final_answer: str) -> str:
     return final_answer.strip()
 
 
+@lru_cache(maxsize=65536)
+def normalize_ground_truth(gt: str, gt_need_extract: bool = False) -> str:
+    """Normalize the ground truth answer, once per label as it is shared by all the responses of a prompt.
+
+    Args:
+        gt: The ground truth answer
+        gt_need_extract: Whether the ground truth needs extraction
+
+    Returns:
+        Normalized ground truth string
+    """
+    if gt_need_extract:
+        return normalize_final_answer(remove_boxed(last_boxed_only_string(gt)))
+    return normalize_final_answer(gt)
+
+
 def is_correct_minerva(
     solution_str: str, gt: str, gt_need_extract: bool = False, answer_pattern: str = r"(?i)Answer\s*:\s*([^\n]+)"
 ) -> tuple[bool, str]:
@@ -199,11 +216,7 @@ def is_correct_minerva(
     extracted_answer = match[-1] if match else "[INVALID]"
     pred = normalize_final_answer(extracted_answer)
 
-    # Process ground truth
-    if gt_need_extract:
-        gt = normalize_final_answer(remove_boxed(last_boxed_only_string(gt)))
-    else:
-        gt = normalize_final_answer(gt)
+    gt = normalize_ground_truth(gt, gt_need_extract)
 
     return (pred == gt), pred
 
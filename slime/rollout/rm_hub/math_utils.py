@@ -5,6 +5,8 @@ Answer checker API that uses sympy to simplify expressions and check for equalit
 Call grade_answer(given_answer: str, ground_truth: str).
 """
 import re
+from fractions import Fraction
+from functools import lru_cache
 from typing import Optional
 
 import sympy
@@ -363,6 +365,38 @@ def are_equal_under_sympy(ground_truth_normalized: str, given_normalized: str):
     return are_equal
 
 
+_INT_REGEX = re.compile(r"^-?[0-9]+$")
+_FRAC_REGEX = re.compile(r"^-?[0-9]+/[0-9]+$")
+_DECIMAL_REGEX = re.compile(r"^-?([0-9]+\.?[0-9]*|\.[0-9]+)$")
+
+
+def are_equal_numerically(ground_truth_normalized: str, given_normalized: str) -> Optional[bool]:
+    """
+    Return the verdict `are_equal_under_sympy` would give if both expressions are plain numbers,
+    or None if it cannot be decided without sympy.
+
+    Sympy parses integers and fractions as exact rationals, and decimals of at most 15 digits as floats
+    of 53 bits, which it compares after rounding the other side to the same precision. Python's `Fraction`
+    and `float` give the same results, without the cost of parsing and simplifying.
+    """
+    values = []
+    is_float = False
+    for expr in (ground_truth_normalized, given_normalized):
+        if _INT_REGEX.match(expr) or _FRAC_REGEX.match(expr):
+            if "/" in expr and int(expr.split("/")[1]) == 0:
+                return None
+            value = Fraction(expr)
+        elif _DECIMAL_REGEX.match(expr) and sum(ch.isdigit() for ch in expr) <= 15:
+            value = Fraction(expr)
+            is_float = True
+        else:
+            return None
+        values.append(value)
+    if is_float:
+        return float(values[0]) == float(values[1])
+    return values[0] == values[1]
+
+
 def split_tuple(expr: str):
     """
     Split the elements in a tuple/interval, while handling well-formatted commas in large numbers
@@ -382,6 +416,37 @@ def split_tuple(expr: str):
     return elems
 
 
+# the same label is graded against all the responses of its prompt, in every epoch,
+# so the ground truth side of the graders is only normalized once per label.
+GROUND_TRUTH_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=GROUND_TRUTH_CACHE_SIZE)
+def extract_ground_truth(ground_truth: str) -> Optional[str]:
+    """
+    Return the answer in a boxed ground truth, or the ground truth itself if it is not boxed.
+    """
+    if "\\boxed" in ground_truth:
+        return extract_answer(ground_truth)
+    return ground_truth
+
+
+@lru_cache(maxsize=GROUND_TRUTH_CACHE_SIZE)
+def normalize_ground_truth_mathd(ground_truth: Optional[str]) -> Optional[str]:
+    return mathd_normalize_answer(ground_truth)
+
+
+@lru_cache(maxsize=GROUND_TRUTH_CACHE_SIZE)
+def normalize_ground_truth_sympy(ground_truth: Optional[str]) -> tuple[Optional[str], tuple[str, ...]]:
+    """
+    Return the normalized ground truth and its elements if it is a tuple/interval.
+    """
+    ground_truth_normalized = _normalize(ground_truth)
+    if ground_truth_normalized is None:
+        return None, ()
+    return ground_truth_normalized, tuple(split_tuple(ground_truth_normalized))
+
+
 def last_boxed_only_string(string):
     idx = string.rfind("\\boxed")
     if idx < 0:
@@ -427,8 +492,12 @@ def extract_boxed_answer(solution: str) -> str:
     return solution
 
 
-def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
-    ground_truth_normalized = _normalize(ground_truth)
+def grade_answer_sympy(given_answer: str, ground_truth: str, fast_path: bool = True) -> bool:
+    # the same strings are always equal after normalization, skip parsing the latex.
+    if fast_path and ground_truth is not None and given_answer == ground_truth:
+        return True
+
+    ground_truth_normalized, ground_truth_elems = normalize_ground_truth_sympy(ground_truth)
     given_normalized = _normalize(given_answer)
 
     if ground_truth_normalized is None:
@@ -440,7 +509,6 @@ def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
     if len(given_normalized) == 0:
         return False
 
-    ground_truth_elems = split_tuple(ground_truth_normalized)
     given_elems = split_tuple(given_normalized)
 
     if len(ground_truth_elems) > 1 and (
@@ -459,7 +527,9 @@ def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
                 # if the ground truth answer is an integer, we require the given answer to be a strict match (no sympy.simplify)
                 is_correct = False
             else:
-                is_correct = are_equal_under_sympy(ground_truth_elem, given_elem)
+                is_correct = are_equal_numerically(ground_truth_elem, given_elem) if fast_path else None
+                if is_correct is None:
+                    is_correct = are_equal_under_sympy(ground_truth_elem, given_elem)
             if not is_correct:
                 break
 
@@ -467,7 +537,7 @@ def grade_answer_sympy(given_answer: str, ground_truth: str) -> bool:
 
 
 def grade_answer_mathd(given_answer: str, ground_truth: str) -> bool:
-    ground_truth_normalized_mathd = mathd_normalize_answer(ground_truth)
+    ground_truth_normalized_mathd = normalize_ground_truth_mathd(ground_truth)
     given_answer_normalized_mathd = mathd_normalize_answer(given_answer)
 
     # be at least as lenient as mathd
@@ -485,8 +555,7 @@ def extract_answer(passage: str) -> str:
 def grade_answer_verl(solution_str, ground_truth):
     if not ground_truth:
         return False
-    if "\\boxed" in ground_truth:
-        ground_truth = extract_answer(ground_truth)
+    ground_truth = extract_ground_truth(ground_truth)
     given_answer = extract_answer(solution_str)
     if given_answer is None:
         return False
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from slime.utils.types import Sample
+
+__all__ = ["RemoteRMClient"]
+
+
+class RemoteRMClient:
+    """
+    A client of the remote reward model that keeps one pooled session for all the requests.
+
+    If `batch_url` is set, the concurrent requests are coalesced into micro-batches, sent when
+    `max_batch_size` samples are waiting or `batch_window` seconds after the first of them. The batch
+    endpoint receives the list of the payloads that `url` receives one by one, and returns the list of
+    their rewards in the same order.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str],
+        batch_url: Optional[str] = None,
+        max_batch_size: int = 32,
+        batch_window: float = 0.01,
+        max_connections: int = 100,
+    ):
+        assert url is not None or batch_url is not None, "Set --rm-url or --rm-batch-url for remote_rm."
+        self.url = url
+        self.batch_url = batch_url
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_connections = max_connections
+        self.loop = None
+        self.session = None
+        self.pending: list[tuple[dict, asyncio.Future]] = []
+        self.flush_handle = None
+        # keep a reference to the running batch requests, so they are not garbage collected.
+        self.tasks = set()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.num_requests = 0
+        self.num_samples = 0
+        self.num_errors = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.loop is not loop:
+            # a session can only be used in the loop it is created in.
+            self.loop = loop
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None),
+            )
+            self.pending = []
+            self.flush_handle = None
+        return self.session
+
+    @staticmethod
+    def get_payload(sample: Sample) -> dict:
+        return {
+            "prompt": sample.prompt,
+            "response": sample.response,
+            "label": sample.label,
+        }
+
+    async def _post(self, url, payload):
+        async with self._get_session().post(url, json=payload) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def score(self, sample: Sample):
+        payload = self.get_payload(sample)
+        if self.batch_url is None:
+            self.num_requests += 1
+            self.num_samples += 1
+            try:
+                return await self._post(self.url, payload)
+            except Exception:
+                self.num_errors += 1
+                raise
+
+        self._get_session()
+        future = self.loop.create_future()
+        self.pending.append((payload, future))
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def score_batch(self, samples: list[Sample]) -> list:
+        # the samples are coalesced with the concurrent requests of the other groups.
+        return await asyncio.gather(*(self.score(sample) for sample in samples))
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        task = self.loop.create_task(self._send_batch(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send_batch(self, batch: list[tuple[dict, asyncio.Future]]):
+        self.num_requests += 1
+        self.num_samples += len(batch)
+        try:
+            rewards = await self._post(self.batch_url, [payload for payload, _ in batch])
+            assert len(rewards) == len(batch), f"Got {len(rewards)} rewards for a batch of {len(batch)} samples."
+        except Exception as e:
+            self.num_errors += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), reward in zip(batch, rewards):
+            # the caller may have been cancelled, e.g. by an abort.
+            if not future.done():
+                future.set_result(reward)
+
+    def get_metrics(self, reset=True) -> dict:
+        """
+        Return the number of requests and the mean batch size since the last reset.
+        """
+        metrics = {
+            "requests": self.num_requests,
+            "errors": self.num_errors,
+        }
+        if self.num_requests > 0:
+            metrics["mean_batch_size"] = self.num_samples / self.num_requests
+        if reset:
+            self._reset_metrics()
+        return metrics
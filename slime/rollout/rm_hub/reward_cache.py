@@ -0,0 +1,99 @@
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Optional
+
+from .math_utils import extract_answer
+
+__all__ = ["RewardCache", "get_reward_cache_key"]
+
+
+def get_reward_cache_key(rm_type: str, response: str, label) -> Optional[tuple]:
+    """
+    Return the key that determines the reward of a rule-based rm, or None if the rm is not cacheable.
+
+    The key is the part of the response the rm actually grades, e.g. the extracted answer, so that all
+    the responses with the same answer share the reward.
+    """
+    base_rm_type = rm_type
+    if base_rm_type.startswith("boxed_"):
+        response = extract_answer(response) or ""
+        base_rm_type = base_rm_type[len("boxed_") :]
+
+    if base_rm_type == "deepscaler":
+        if "</think>" in response:
+            answer = extract_answer(response.split("</think>")[1])
+        elif "###Response" in response:
+            answer = extract_answer(response.split("###Response")[1])
+        else:
+            answer = None
+    elif base_rm_type == "math":
+        answer = extract_answer(response)
+    elif base_rm_type == "dapo":
+        # the same extraction as `math_dapo_utils.is_correct_minerva`.
+        match = re.findall(r"(?i)Answer\s*:\s*([^\n]+)", response[-300:])
+        answer = match[-1] if match else None
+    else:
+        return None
+    return rm_type, answer, json.dumps(label)
+
+
+class RewardCache:
+    """
+    A bounded LRU cache of the rewards of the rule-based rms, optionally persisted to a jsonl file.
+    """
+
+    def __init__(self, max_size: int, path: Optional[str] = None):
+        self.max_size = max_size
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.file = None
+        if path is not None:
+            if os.path.exists(path):
+                with open(path) as f:
+                    for line in f:
+                        *key, reward = json.loads(line)
+                        self._put(tuple(key), reward)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.file = open(path, "a")
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get(self, key):
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        self.misses += 1
+        return None
+
+    def _put(self, key, reward):
+        self.cache[key] = reward
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def put(self, key, reward):
+        self._put(key, reward)
+        if self.file is not None:
+            self.file.write(json.dumps([*key, reward]) + "\n")
+            self.file.flush()
+
+    def get_metrics(self, reset=True) -> dict:
+        """
+        Return the hit rate since the last reset.
+        """
+        total = self.hits + self.misses
+        metrics = {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if total > 0:
+            metrics["hit_rate"] = self.hits / total
+        if reset:
+            self.hits = self.misses = 0
+        return metrics
@@ -0,0 +1,138 @@
+import copy
+import os
+import time
+
+import ray
+
+from slime.utils.async_utils import run
+from slime.utils.http_utils import init_http_client
+from slime.utils.misc import SingletonMeta
+from slime.utils.types import Sample
+
+from .sglang_example import GenerateState, abort, abort_all_requests, collect_rollout_groups, select_rollout_groups
+
+__all__ = ["RolloutWorker", "RolloutWorkerPool"]
+
+
+def get_shard_args(args, worker_id: int, num_workers: int):
+    """
+    Return the args of a rollout worker, with its share of the prompt groups and of the concurrency.
+    """
+
+    def get_share(total):
+        return total // num_workers + (worker_id < total % num_workers)
+
+    def get_ceil_share(total):
+        return None if total is None else (total + num_workers - 1) // num_workers
+
+    shard_args = copy.copy(args)
+    shard_args.rollout_batch_size = get_share(args.rollout_batch_size)
+    shard_args.over_sampling_batch_size = get_share(args.over_sampling_batch_size)
+    shard_args.sglang_server_concurrency = get_ceil_share(args.sglang_server_concurrency)
+    shard_args.rollout_max_concurrency = get_ceil_share(args.rollout_max_concurrency)
+    shard_args.http_max_connections = get_ceil_share(args.http_max_connections)
+    return shard_args
+
+
+@ray.remote
+class RolloutWorker:
+    """
+    A process generating a shard of the prompt groups of each rollout, with its own event loop, http clients,
+    tokenizer and reward computation.
+
+    The prompts are fetched from the data buffer, and with --rollout-streaming the finished groups are
+    published to it directly. A rollout is generated in two calls, `collect` and `finish`, so that the
+    requests left in the engines are only aborted once all the workers have collected their shards.
+    """
+
+    def __init__(self, args, data_buffer, worker_id: int):
+        self.args = args
+        self.data_buffer = data_buffer
+        self.worker_id = worker_id
+        self.data = None
+        self.publish_refs = []
+        # load the tokenizer and the http clients before the first rollout.
+        GenerateState(args)
+
+    def _publish_groups(self, groups: list[list[Sample]]):
+        self.publish_refs.append(self.data_buffer.publish_groups.remote(groups))
+
+    def collect(self, rollout_id: int):
+        """
+        Generate until the shard of the rollout is collected, the unfinished requests are left in the engines.
+        """
+        self.data = run(
+            collect_rollout_groups(
+                self.args,
+                self.data_buffer.get_samples.remote,
+                publish_groups=self._publish_groups if self.args.rollout_streaming else None,
+            )
+        )
+        # do not send the queued requests, the other workers may still need the engines.
+        GenerateState(self.args).aborted = True
+        ray.get(self.publish_refs)
+        self.publish_refs = []
+
+    def finish(self, rollout_id: int) -> tuple[list[list[Sample]], list[Sample], dict]:
+        """
+        Wait for the aborted requests, and return the collected groups, the partial samples and the metrics.
+        """
+        state = GenerateState(self.args)
+        aborted_samples = run(abort(self.args, rollout_id, abort_requests=False))
+        if self.args.rollout_trace_dir is not None:
+            state.tracer.dump(
+                os.path.join(self.args.rollout_trace_dir, f"rollout_{rollout_id}_worker_{self.worker_id}.jsonl")
+            )
+        metrics = state.get_rollout_metrics()
+        state.reset()
+        data, self.data = self.data, None
+        return data, aborted_samples, metrics
+
+
+class RolloutWorkerPool(metaclass=SingletonMeta):
+    """
+    The rollout workers of the data buffer, created in its process on the first rollout.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        init_http_client(args)
+        data_buffer = ray.get_runtime_context().current_actor
+        self.workers = [
+            RolloutWorker.options(num_cpus=1, num_gpus=0).remote(
+                get_shard_args(args, i, args.rollout_num_workers), data_buffer, i
+            )
+            for i in range(args.rollout_num_workers)
+        ]
+
+    def generate(self, rollout_id: int) -> tuple[list[list[Sample]], list[Sample], dict]:
+        """
+        Generate a rollout with all the workers, and return the groups, the partial samples and the metrics.
+        """
+        start_time = time.perf_counter()
+        ray.get([worker.collect.remote(rollout_id) for worker in self.workers])
+        generation_time = time.perf_counter() - start_time
+
+        # all the shards are collected, abort the unfinished requests of all the workers at once.
+        run(abort_all_requests(self.args))
+        results = ray.get([worker.finish.remote(rollout_id) for worker in self.workers])
+
+        data = sum((worker_data for worker_data, _, _ in results), [])
+        aborted_samples = sum((worker_aborted_samples for _, worker_aborted_samples, _ in results), [])
+        # with --rollout-streaming, the data buffer puts the groups back in the order they are published in.
+        data = select_rollout_groups(self.args, data, sort=not self.args.rollout_streaming)
+        return data, aborted_samples, self._merge_metrics([metrics for _, _, metrics in results], generation_time)
+
+    @staticmethod
+    def _merge_metrics(worker_metrics: list[dict], generation_time: float) -> dict:
+        # the metrics are averaged over the workers, the spread of their generation time is the imbalance of the shards.
+        keys = set().union(*worker_metrics)
+        metrics = {}
+        for key in keys:
+            values = [m[key] for m in worker_metrics if key in m]
+            metrics[key] = sum(values) / len(values)
+        worker_generation_times = [m["generation_time"] for m in worker_metrics]
+        metrics["workers/min_generation_time"] = min(worker_generation_times)
+        metrics["workers/max_generation_time"] = max(worker_generation_times)
+        metrics["generation_time"] = generation_time
+        return metrics
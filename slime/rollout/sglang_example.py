@@ -1,16 +1,23 @@
 import asyncio
-import copy
+import inspect
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 
 from tqdm import tqdm
 from transformers import AutoTokenizer
 
-from slime.utils.async_utils import run
+from slime.utils.async_utils import AdaptiveSemaphore, run
 from slime.utils.data import Dataset
-from slime.utils.http_utils import get, post
+from slime.utils.http_utils import get, init_http_client, post
 from slime.utils.misc import SingletonMeta, load_function
 from slime.utils.types import Sample
 
-from .rm_hub import async_rm, batched_async_rm
+from .affinity_router import AffinityRouter
+from .length_predictor import LengthPredictor
+from .request_tracer import RequestTracer
+from .rm_hub import async_rm, batched_async_rm, get_remote_rm_client, get_reward_cache
 
 __all__ = ["generate_rollout"]
 
@@ -23,10 +30,20 @@ class GenerateState(metaclass=SingletonMeta):
     def __init__(self, args):
         # persistant state for the generation process
         self.args = args
+        init_http_client(args)
         self.tokenizer = AutoTokenizer.from_pretrained(args.hf_checkpoint, trust_remote_code=True)
-        self.semaphore = asyncio.Semaphore(
-            args.sglang_server_concurrency * args.rollout_num_gpus // args.rollout_num_gpus_per_engine
-        )
+        concurrency = args.sglang_server_concurrency * args.rollout_num_gpus // args.rollout_num_gpus_per_engine
+        if args.rollout_adaptive_concurrency:
+            num_engines = args.rollout_num_gpus // args.rollout_num_gpus_per_engine
+            self.semaphore = AdaptiveSemaphore(
+                concurrency,
+                min_limit=num_engines,
+                max_limit=args.rollout_max_concurrency or 2 * concurrency,
+                increase=num_engines,
+                tolerance=args.rollout_concurrency_latency_tolerance,
+            )
+        else:
+            self.semaphore = asyncio.Semaphore(concurrency)
         self.sampling_params = dict(
             temperature=args.rollout_temperature,
             top_p=args.rollout_top_p,
@@ -38,41 +55,103 @@ class GenerateState(metaclass=SingletonMeta):
             no_stop_trim=True,
             spaces_between_special_tokens=False,
         )
+        # serialize the acquisition of multiple slots, so that two groups never wait on each other's slots.
+        self.multi_acquire_lock = asyncio.Lock()
+        self.affinity_router = AffinityRouter(args) if args.rollout_group_affinity else None
+        self.length_predictor = LengthPredictor() if args.rollout_length_aware_scheduling else None
+        self.tracer = RequestTracer()
+        # the metrics of the last rollout
+        self.rollout_metrics = {}
         self.reset()
 
+    @asynccontextmanager
+    async def acquire_slots(self, num_slots: int):
+        """
+        Hold `num_slots` slots of the semaphore, e.g. for a request generating multiple samples.
+        """
+        acquired = 0
+        try:
+            async with self.multi_acquire_lock:
+                for _ in range(num_slots):
+                    await self.semaphore.acquire()
+                    acquired += 1
+            yield
+        finally:
+            for _ in range(acquired):
+                self.semaphore.release()
+
     def reset(self):
         self.remaining_batch_size = 0
         self.pendings = set()
         self.aborted = False
+        if self.affinity_router is not None:
+            self.affinity_router.reset()
 
     def submit_generate_tasks(self, samples: list[list[Sample]]):
-        for group in samples:
-            self.pendings.add(
-                asyncio.create_task(
-                    # submit a group of samples as a single task.
-                    generate_and_rm_group(
-                        self.args,
-                        group,
-                        sampling_params=self.sampling_params.copy(),
-                        evaluation=False,
-                    )
+        predictions = [None] * len(samples)
+        if self.length_predictor is not None:
+            predictions = [self.length_predictor.predict(group) for group in samples]
+            # start the long generations first, so that the short ones fill the tail of the rollout.
+            order = sorted(range(len(samples)), key=lambda i: predictions[i], reverse=True)
+            samples = [samples[i] for i in order]
+            predictions = [predictions[i] for i in order]
+
+        for group, predicted in zip(samples, predictions):
+            task = asyncio.create_task(
+                # submit a group of samples as a single task.
+                generate_and_rm_group(
+                    self.args,
+                    group,
+                    sampling_params=self.sampling_params.copy(),
+                    evaluation=False,
                 )
             )
+            if self.length_predictor is not None:
+                task.add_done_callback(partial(self._update_length_predictor, predicted=predicted))
+            self.pendings.add(task)
         self.remaining_batch_size += len(samples)
 
+    def _update_length_predictor(self, task: asyncio.Task, predicted: float):
+        if not task.cancelled() and task.exception() is None:
+            self.length_predictor.update(task.result(), predicted)
+
+    def get_rollout_metrics(self) -> dict:
+        """
+        Return the metrics of the last rollout.
+        """
+        metrics = self.rollout_metrics
+        self.rollout_metrics = {}
+        if isinstance(self.semaphore, AdaptiveSemaphore):
+            metrics.update({f"concurrency/{key}": value for key, value in self.semaphore.get_metrics().items()})
+        if self.length_predictor is not None:
+            metrics.update({f"scheduling/{key}": value for key, value in self.length_predictor.get_metrics().items()})
+        metrics.update({f"trace/{key}": value for key, value in self.tracer.get_metrics().items()})
+        if (reward_cache := get_reward_cache(self.args)) is not None:
+            metrics.update({f"rm_cache/{key}": value for key, value in reward_cache.get_metrics().items()})
+        if self.args.rm_type == "remote_rm" and self.args.custom_rm_path is None:
+            remote_rm_metrics = get_remote_rm_client(self.args).get_metrics()
+            metrics.update({f"remote_rm/{key}": value for key, value in remote_rm_metrics.items()})
+        self.tracer.reset()
+        return metrics
+
 
 async def generate(args, sample: Sample, sampling_params) -> Sample:
     state = GenerateState(args)
 
-    url = f"http://{args.sglang_router_ip}:{args.sglang_router_port}/generate"
+    url = get_generate_url(args, sample)
 
     assert (
         sample.status == Sample.Status.PENDING or sample.status == Sample.Status.ABORTED
     ), f"Sample status is {sample.status}"
 
-    if len(sample.response) > 0:
-        response_token_ids = state.tokenizer(sample.response, add_special_tokens=False)["input_ids"]
-        sampling_params["max_new_tokens"] -= len(response_token_ids)
+    if len(sample.tokens) == 0:
+        # the prompt token ids are not provided by the data source.
+        with state.tracer.trace(sample, "tokenize"):
+            sample.tokens = state.tokenizer(sample.prompt, add_special_tokens=False)["input_ids"]
+
+    # Handle partial rollout samples: continue generation from existing response
+    if sample.response_length > 0:
+        sampling_params["max_new_tokens"] -= sample.response_length
 
     assert (
         sampling_params["max_new_tokens"] >= 0
@@ -81,20 +160,41 @@ async def generate(args, sample: Sample, sampling_params) -> Sample:
         sample.status = Sample.Status.TRUNCATED
         return sample
 
-    # Handle partial rollout samples: continue generation from existing response
-    input_text = sample.prompt + sample.response
-
+    # send the token ids and read back the generated token ids, so that neither the prompt
+    # nor the response needs to be re-tokenized.
     payload = {
-        "text": input_text,
+        "input_ids": sample.tokens,
         "sampling_params": sampling_params,
+        "return_logprob": True,
     }
 
+    start_time = time.perf_counter()
     output = await post(url, payload, use_http2=args.use_http2)
+    latency = time.perf_counter() - start_time
+    state.tracer.add(sample, "http", latency)
+    if "e2e_latency" in output["meta_info"]:
+        state.tracer.add(sample, "engine", output["meta_info"]["e2e_latency"])
+
+    response_length = sample.response_length
+    with state.tracer.trace(sample, "postprocess"):
+        update_sample_with_output(sample, output)
+    if isinstance(state.semaphore, AdaptiveSemaphore) and sample.status != Sample.Status.ABORTED:
+        state.semaphore.record(latency, sample.response_length - response_length)
+    return sample
+
+
+def get_generate_url(args, sample: Sample) -> str:
+    if args.rollout_group_affinity and "engine_url" in sample.metadata:
+        # send the request to the engine of the group directly, bypassing the router.
+        return f"{sample.metadata['engine_url']}/generate"
+    return f"http://{args.sglang_router_ip}:{args.sglang_router_port}/generate"
+
+
+def update_sample_with_output(sample: Sample, output: dict):
+    response_token_ids = [item[1] for item in output["meta_info"].get("output_token_logprobs", [])]
     sample.response += output["text"]
-    prompt_tokens_ids = state.tokenizer(sample.prompt, add_special_tokens=False)["input_ids"]
-    response_token_ids = state.tokenizer(sample.response, add_special_tokens=False)["input_ids"]
-    sample.tokens = prompt_tokens_ids + response_token_ids
-    sample.response_length = len(response_token_ids)
+    sample.tokens = sample.tokens + response_token_ids
+    sample.response_length += len(response_token_ids)
 
     match output["meta_info"]["finish_reason"]["type"]:
         case "length":
@@ -104,7 +204,57 @@ async def generate(args, sample: Sample, sampling_params) -> Sample:
         case "stop":
             sample.status = Sample.Status.COMPLETED
 
-    return sample
+
+def can_generate_in_parallel(args, group: list[Sample]) -> bool:
+    """
+    Whether the group can be generated with a single parallel sampling request,
+    i.e. none of its samples has started generating yet.
+    """
+    return (
+        args.rollout_parallel_sampling
+        and args.custom_generate_function_path is None
+        and len(group) > 1
+        and all(
+            sample.status == Sample.Status.PENDING and sample.response_length == 0 and sample.prompt == group[0].prompt
+            for sample in group
+        )
+    )
+
+
+async def generate_group(args, group: list[Sample], sampling_params) -> list[Sample]:
+    """
+    Generate all samples of a fresh group with one request, sampling `n` responses with a shared prefill.
+    """
+    state = GenerateState(args)
+
+    url = get_generate_url(args, group[0])
+
+    if len(group[0].tokens) == 0:
+        with state.tracer.trace(group[0], "tokenize"):
+            tokens = state.tokenizer(group[0].prompt, add_special_tokens=False)["input_ids"]
+        for sample in group:
+            sample.tokens = tokens
+
+    payload = {
+        "input_ids": group[0].tokens,
+        "sampling_params": {**sampling_params, "n": len(group)},
+        "return_logprob": True,
+    }
+
+    start_time = time.perf_counter()
+    outputs = await post(url, payload, use_http2=args.use_http2)
+    latency = time.perf_counter() - start_time
+    assert len(outputs) == len(group), f"Got {len(outputs)} outputs for a group of {len(group)} samples"
+    for sample, output in zip(group, outputs):
+        state.tracer.add(sample, "http", latency)
+        if "e2e_latency" in output["meta_info"]:
+            state.tracer.add(sample, "engine", output["meta_info"]["e2e_latency"])
+        with state.tracer.trace(sample, "postprocess"):
+            update_sample_with_output(sample, output)
+    if isinstance(state.semaphore, AdaptiveSemaphore) and all(s.status != Sample.Status.ABORTED for s in group):
+        # the sequences are decoded together, so the latency is that of the longest one.
+        state.semaphore.record(latency, max(sample.response_length for sample in group))
+    return group
 
 
 async def generate_and_rm(args, sample: Sample, sampling_params: dict, evaluation=False) -> Sample:
@@ -118,14 +268,17 @@ async def generate_and_rm(args, sample: Sample, sampling_params: dict, evaluatio
     state = GenerateState(args)
 
     # generate
+    start_time = time.perf_counter()
     async with state.semaphore:
+        state.tracer.add(sample, "semaphore", time.perf_counter() - start_time)
         if state.aborted:
             sample.status = Sample.Status.ABORTED
             return sample
 
         if args.custom_generate_function_path is not None:
             custom_generate_func = load_function(args.custom_generate_function_path)
-            sample = await custom_generate_func(args, sample, sampling_params)
+            with state.tracer.trace(sample, "custom_generate"):
+                sample = await custom_generate_func(args, sample, sampling_params)
         else:
             sample = await generate(args, sample, sampling_params)
 
@@ -136,36 +289,76 @@ async def generate_and_rm(args, sample: Sample, sampling_params: dict, evaluatio
     if args.group_rm:
         return sample
 
-    sample.reward = await async_rm(args, sample)
+    with state.tracer.trace(sample, "rm"):
+        sample.reward = await async_rm(args, sample)
 
     return sample
 
 
+async def generate_and_rm_parallel(args, group: list[Sample], sampling_params: dict, evaluation=False) -> list[Sample]:
+    state = GenerateState(args)
+
+    # generate, the request takes one slot per sample.
+    start_time = time.perf_counter()
+    async with state.acquire_slots(len(group)):
+        for sample in group:
+            state.tracer.add(sample, "semaphore", time.perf_counter() - start_time)
+        if state.aborted:
+            for sample in group:
+                sample.status = Sample.Status.ABORTED
+            return group
+
+        group = await generate_group(args, group, sampling_params)
+
+    # for the rm that need the whole group, we will not do the rm here
+    if args.group_rm:
+        return group
+
+    async def _rm(sample):
+        with state.tracer.trace(sample, "rm"):
+            sample.reward = await async_rm(args, sample)
+
+    await asyncio.gather(*[_rm(sample) for sample in group if sample.status != Sample.Status.ABORTED])
+
+    return group
+
+
 async def generate_and_rm_group(args, group: list[Sample], sampling_params: dict, evaluation=False) -> list[Sample]:
     state = GenerateState(args)
 
     if state.aborted:
         return group
 
-    group = await asyncio.gather(
-        *[generate_and_rm(args, sample, sampling_params.copy(), evaluation=evaluation) for sample in group]
-    )
+    start_time = time.perf_counter()
+
+    async def _generate_and_rm_group():
+        if can_generate_in_parallel(args, group):
+            return await generate_and_rm_parallel(args, group, sampling_params.copy(), evaluation=evaluation)
+        return await asyncio.gather(
+            *[generate_and_rm(args, sample, sampling_params.copy(), evaluation=evaluation) for sample in group]
+        )
+
+    if state.affinity_router is not None and not evaluation:
+        async with state.affinity_router.pin(group):
+            group = await _generate_and_rm_group()
+    else:
+        group = await _generate_and_rm_group()
 
     # for the rm that need the whole group, we will not do the rm here
     if not state.aborted and args.group_rm:
+        rm_start_time = time.perf_counter()
         rewards = await batched_async_rm(args, group)
         for sample, reward in zip(group, rewards):
             sample.reward = reward
+            state.tracer.add(sample, "rm", time.perf_counter() - rm_start_time)
 
+    for sample in group:
+        state.tracer.add(sample, "total", time.perf_counter() - start_time)
+        state.tracer.finish(sample)
     return group
 
 
-async def abort(args, rollout_id: int):
-    aborted_samples = []
-
-    state = GenerateState(args)
-    assert not state.aborted
-    state.aborted = True
+async def abort_all_requests(args):
     response = await get(
         f"http://{args.sglang_router_ip}:{args.sglang_router_port}/list_workers", use_http2=args.use_http2
     )
@@ -175,6 +368,22 @@ async def abort(args, rollout_id: int):
         print(f"Abort request for {url}", flush=True)
         await post(f"{url}/abort_request", {"abort_all": True}, use_http2=False)
 
+
+async def abort(args, rollout_id: int, abort_requests=True):
+    """
+    Abort the unfinished requests of the rollout and wait for them.
+
+    If not `abort_requests`, the requests in the engines are aborted by the caller instead, e.g. once all
+    the rollout workers have collected their shards.
+    """
+    aborted_samples = []
+
+    state = GenerateState(args)
+    # no new requests are sent from now on.
+    state.aborted = True
+    if abort_requests:
+        await abort_all_requests(args)
+
     # make sure all the pending tasks are finished
     count = 0
     while state.pendings:
@@ -198,39 +407,46 @@ async def abort(args, rollout_id: int):
     return aborted_samples
 
 
-async def generate_rollout_async(args, rollout_id: int, data_source) -> list[list[Sample]]:
-    """An example to implement the generate_rollout function for an rule based rm rollout generation.
+async def collect_rollout_groups(args, data_source, publish_groups=None) -> list[list[Sample]]:
+    """
+    Generate the groups of a rollout until enough of them pass the dynamic sampling filter.
+
+    The unfinished requests are left running, they should be aborted with `abort` afterwards.
 
     Args:
         args: the whole args
-        rollout_id: int, the id of the rollout, used for deterministic data generation
-        data_source: the data source to fetch
+        data_source: the data source to fetch, it may also return an awaitable, e.g. of a remote data buffer
+        publish_groups: if set, called with the groups as soon as they are collected, to stream them to the trainer
 
     Returns:
-        list[list[Sample]]: a list of samples generated by the rollout, the length of the list is exactly the same as the `rollout_batch_size`
+        list[list[Sample]]: the collected groups, in the order they are finished
     """
-    assert args.rollout_global_dataset
-
     state = GenerateState(args)
 
     # instantiate data filters
     dynamic_filter = (
         load_function(args.dynamic_sampling_filter_path) if args.dynamic_sampling_filter_path is not None else None
     )
-    over_sampling_filter = (
-        load_function(args.over_sampling_filter_path) if args.over_sampling_filter_path is not None else None
-    )
+    # the streamed groups are final, they cannot be selected again by the over sampling filter.
+    assert publish_groups is None or args.over_sampling_filter_path is None
 
     # target_data_size is the total number of valid samples to get
-    target_data_size = args.over_sampling_batch_size if over_sampling_filter is not None else args.rollout_batch_size
+    target_data_size = (
+        args.over_sampling_batch_size if args.over_sampling_filter_path is not None else args.rollout_batch_size
+    )
 
     data = []
     do_print = True
+    start_time = time.perf_counter()
+    # the time when 90% of the groups are collected, the rest of the rollout is the tail.
+    tail_start_time = None
     pbar = tqdm(total=target_data_size * args.n_samples_per_prompt, desc="Rollout generation")
     while len(data) < target_data_size:
         while state.remaining_batch_size < target_data_size:
             # get samples from the buffer and submit the generation requests.
             samples = data_source(args.over_sampling_batch_size)
+            if inspect.isawaitable(samples):
+                samples = await samples
             state.submit_generate_tasks(samples)
 
         # wait for the generation to finish
@@ -255,21 +471,58 @@ async def generate_rollout_async(args, rollout_id: int, data_source) -> list[lis
             if len(data) < target_data_size:
                 data.append(group)
                 pbar.update(args.n_samples_per_prompt)
+                if publish_groups is not None:
+                    publish_groups([group])
+                if tail_start_time is None and len(data) >= 0.9 * target_data_size:
+                    tail_start_time = time.perf_counter()
 
     pbar.close()
+    end_time = time.perf_counter()
+    state.rollout_metrics["generation_time"] = end_time - start_time
+    state.rollout_metrics["tail_time"] = end_time - tail_start_time
     print(
         f"Finish rollout: {[data[-1][0].prompt + data[-1][0].response]}, label: {data[-1][0].label}, reward: {data[-1][0].reward}",
         flush=True,
     )
+    return data
 
-    # there are still some unfinished requests, abort them
-    aborted_samples = await abort(args, rollout_id)
 
-    if over_sampling_filter is not None:
+def select_rollout_groups(args, data: list[list[Sample]], sort=True) -> list[list[Sample]]:
+    """
+    Select the rollout_batch_size groups of the rollout from the collected ones, with the over sampling filter.
+    """
+    if args.over_sampling_filter_path is not None:
+        over_sampling_filter = load_function(args.over_sampling_filter_path)
         data = over_sampling_filter(args, data)[: args.rollout_batch_size]
 
     assert len(data) == args.rollout_batch_size, f"Got {len(data)} samples, expected {args.rollout_batch_size}"
-    data = sorted(data, key=lambda group: group[0].index)
+    if sort:
+        data = sorted(data, key=lambda group: group[0].index)
+    return data
+
+
+async def generate_rollout_async(args, rollout_id: int, data_source, publish_groups=None) -> list[list[Sample]]:
+    """An example to implement the generate_rollout function for an rule based rm rollout generation.
+
+    Args:
+        args: the whole args
+        rollout_id: int, the id of the rollout, used for deterministic data generation
+        data_source: the data source to fetch
+        publish_groups: if set, called with the groups as soon as they are collected, to stream them to the trainer
+
+    Returns:
+        list[list[Sample]]: a list of samples generated by the rollout, the length of the list is exactly the same as the `rollout_batch_size`
+    """
+    assert args.rollout_global_dataset
+
+    state = GenerateState(args)
+    data = await collect_rollout_groups(args, data_source, publish_groups=publish_groups)
+
+    # there are still some unfinished requests, abort them
+    aborted_samples = await abort(args, rollout_id)
+
+    # the streamed groups keep the order they are published in.
+    data = select_rollout_groups(args, data, sort=publish_groups is None)
 
     # reset the global state to prevent effects on the next rollout or eval.
     state.reset()
@@ -312,6 +565,8 @@ async def eval_rollout_single_dataset(args, rollout_id, name, path):
             metadata_key=args.metadata_key,
             tool_key=args.tool_key if args.eval_tool_key is None else args.eval_tool_key,
             apply_chat_template=args.apply_chat_template,
+            num_workers=args.prompt_filter_num_workers,
+            cache_dir=args.prompt_cache_dir,
         )
     dataset = EVAL_PROMPT_DATASET[name]
 
@@ -332,12 +587,15 @@ async def eval_rollout_single_dataset(args, rollout_id, name, path):
     tasks = []
     # do multiple samples for eval prompts
     sample_index = 0
-    for i, prompt_sample in enumerate(dataset.samples):
-        for j in range(args.n_samples_per_eval_prompt):
-            # use the same prompt for multiple samples
-            sample = copy.deepcopy(prompt_sample)
-            sample.index = sample_index
-            sample_index += 1
+    for i, prompt_sample in enumerate(dataset):
+        # use the same prompt for multiple samples
+        group = [prompt_sample.clone(index=sample_index + j) for j in range(args.n_samples_per_eval_prompt)]
+        sample_index += len(group)
+        if can_generate_in_parallel(args, group):
+            # the samples of a prompt are generated with one request.
+            tasks.append(generate_and_rm_group(args, group, sampling_params=sampling_params, evaluation=True))
+            continue
+        for sample in group:
             tasks.append(
                 generate_and_rm(
                     args,
@@ -349,14 +607,15 @@ async def eval_rollout_single_dataset(args, rollout_id, name, path):
 
     data = []
     do_print = True
-    pbar = tqdm(total=len(tasks), desc="Rollout generation", disable=not do_print)
+    pbar = tqdm(total=sample_index, desc="Rollout generation", disable=not do_print)
     for coro in asyncio.as_completed(tasks):
-        sample = await coro
+        result = await coro
+        samples = result if isinstance(result, list) else [result]
         if do_print:
-            print([sample.prompt + sample.response], sample.reward, flush=True)
+            print([samples[0].prompt + samples[0].response], samples[0].reward, flush=True)
             do_print = False
-        data.append(sample)
-        pbar.update(1)
+        data.extend(samples)
+        pbar.update(len(samples))
     pbar.close()
 
     data.sort(key=lambda sample: sample.index)
@@ -383,15 +642,37 @@ def generate_rollout(args, rollout_id, data_buffer, evaluation=False):
     Returns:
         list[list[Sample]]: a list of list of samples generated by the rollout
     """
+    if not evaluation and args.rollout_num_workers > 1:
+        # the rollout workers import this module.
+        from .rollout_worker import RolloutWorkerPool
+
+        completed_samples, aborted_samples, metrics = RolloutWorkerPool(args).generate(rollout_id)
+        data_buffer.add_samples(aborted_samples)
+        data_buffer.log_rollout_metrics(rollout_id, metrics)
+        return completed_samples
+
     completed_samples, aborted_samples = generate_abortable_samples(
-        args, rollout_id, data_buffer.get_samples, evaluation=evaluation
+        args,
+        rollout_id,
+        data_buffer.get_samples,
+        evaluation=evaluation,
+        publish_groups=data_buffer.publish_groups if args.rollout_streaming else None,
     )
     data_buffer.add_samples(aborted_samples)
+
+    state = GenerateState(args)
+    if not evaluation:
+        if args.rollout_trace_dir is not None:
+            state.tracer.dump(os.path.join(args.rollout_trace_dir, f"rollout_{rollout_id}.jsonl"))
+        data_buffer.log_rollout_metrics(rollout_id, state.get_rollout_metrics())
+    else:
+        # the eval samples are not traced.
+        state.tracer.reset()
     return completed_samples
 
 
-def generate_abortable_samples(args, rollout_id, data_source, evaluation=False):
+def generate_abortable_samples(args, rollout_id, data_source, evaluation=False, publish_groups=None):
     assert args.rollout_global_dataset
     if evaluation:
         return run(eval_rollout(args, rollout_id))
-    return run(generate_rollout_async(args, rollout_id, data_source))
+    return run(generate_rollout_async(args, rollout_id, data_source, publish_groups=publish_groups))
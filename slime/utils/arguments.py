@@ -128,6 +128,26 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                     "This is not recommended if the dataset is large."
                 ),
             )
+            parser.add_argument(
+                "--prompt-filter-num-workers",
+                type=int,
+                default=8,
+                help=(
+                    "Number of processes used to apply chat template and tokenize the prompts "
+                    "when filtering the dataset with --rollout-max-prompt-len. "
+                    "Set to 1 to filter in the current process."
+                ),
+            )
+            parser.add_argument(
+                "--prompt-cache-dir",
+                type=str,
+                default=None,
+                help=(
+                    "Directory for the on-disk cache of the rendered and tokenized prompts. "
+                    "The cache is keyed by the prompt file, the tokenizer, --apply-chat-template and "
+                    "--rollout-max-prompt-len, and is memory mapped so that it can be shared by the actors on one node."
+                ),
+            )
             parser.add_argument(
                 "--rollout-max-response-len",
                 type=int,
@@ -240,6 +260,102 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                     "This is useful for long responses."
                 ),
             )
+            parser.add_argument(
+                "--rollout-streaming",
+                action="store_true",
+                default=False,
+                help=(
+                    "Only for train_async.py. "
+                    "Stream the rollout to the trainer in chunks of global_batch_size samples, "
+                    "so that each optimizer step starts as soon as its groups are generated, "
+                    "instead of waiting for the whole rollout. "
+                    "The rewards are still normalized within each group, "
+                    "but --normalize-advantages whitens the advantages over each chunk instead of the whole rollout. "
+                    "Use --keep-old-actor to compute the old log probs of all chunks with the weights of the rollout. "
+                    "Not compatible with --over-sampling-filter-path."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-group-affinity",
+                action="store_true",
+                default=False,
+                help=(
+                    "Whether to send all the samples of a group, and their continuations in partial rollout, "
+                    "to the same sglang engine, so that the shared prompt hits the radix cache. "
+                    "The groups are balanced across the engines by the number of outstanding requests."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-parallel-sampling",
+                action="store_true",
+                default=False,
+                help=(
+                    "Whether to generate all the samples of a prompt group with a single request to sglang, "
+                    "using parallel sampling (`n` in the sampling params) to share the prefill of the prompt. "
+                    "Groups with partial responses and custom generate functions still use one request per sample."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-adaptive-concurrency",
+                action="store_true",
+                default=False,
+                help=(
+                    "Whether to adjust the number of concurrent generation requests during rollout, "
+                    "starting from sglang_server_concurrency per engine. "
+                    "The limit is increased while the latency per output token stays close to the best one seen, "
+                    "and decreased when it grows, e.g. because the requests are queueing in the engines."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-max-concurrency",
+                type=int,
+                default=None,
+                help=(
+                    "The max number of concurrent generation requests with adaptive concurrency. "
+                    "Defaults to twice the initial one."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-concurrency-latency-tolerance",
+                type=float,
+                default=0.5,
+                help=(
+                    "With adaptive concurrency, the concurrency is decreased when the latency per output token "
+                    "exceeds the best one seen by more than this ratio."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-length-aware-scheduling",
+                action="store_true",
+                default=False,
+                help=(
+                    "Whether to submit the prompt groups in the order of their predicted response length, "
+                    "longest first, so that the long generations do not start late and stall the end of the rollout. "
+                    "The length is predicted from the previous responses of the same prompt or of prompts of similar length."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-trace-dir",
+                type=str,
+                default=None,
+                help=(
+                    "If set, dump the per-phase latency traces of all the samples of each rollout "
+                    "to `rollout_trace_dir/rollout_{rollout_id}.jsonl` for offline analysis. "
+                    "The p50/p90/p99 of each phase are always logged under `rollout/trace/`."
+                ),
+            )
+            parser.add_argument(
+                "--rollout-num-workers",
+                type=int,
+                default=1,
+                help=(
+                    "The number of processes generating each rollout, for the default rollout function. "
+                    "The prompt groups and the concurrency are split evenly across them, and each one has its own "
+                    "event loop, http clients, tokenization and reward computation, "
+                    "so that the rollout is not bound by a single CPU core. "
+                    "The default of 1 generates the rollout in the data buffer process."
+                ),
+            )
             parser.add_argument(
                 "--custom-generate-function-path",
                 type=str,
@@ -260,6 +376,33 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                     "The function should take list[list[Sample]] and return list[list[Sample]]."
                 ),
             )
+            parser.add_argument(
+                "--buffer-policy",
+                type=str,
+                choices=["fifo", "oldest", "shortest_remaining"],
+                default="fifo",
+                help=(
+                    "The order the sample groups are taken from the buffer, e.g. of the partial rollouts: "
+                    "fifo in the order they are added, oldest with the smallest start rollout id first, "
+                    "shortest_remaining with the fewest tokens left to generate first. "
+                    "With --buffer-filter-path, the filter receives the groups in this order."
+                ),
+            )
+            parser.add_argument(
+                "--buffer-max-size",
+                type=int,
+                default=None,
+                help="The max number of sample groups in the buffer, the oldest groups are evicted beyond it.",
+            )
+            parser.add_argument(
+                "--buffer-max-staleness",
+                type=int,
+                default=None,
+                help=(
+                    "The sample groups first generated more than this number of rollouts ago "
+                    "are evicted from the buffer instead of being continued."
+                ),
+            )
             # update weight
             parser.add_argument(
                 "--update-weight-buffer-size",
@@ -276,6 +419,17 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                 default=1,
                 help="Interval for updating the weights",
             )
+            parser.add_argument(
+                "--rollout-pipeline-depth",
+                type=int,
+                default=1,
+                help=(
+                    "Only for train_async.py. "
+                    "The max number of rollouts generated ahead of the one being trained, "
+                    "i.e. the samples may come from weights up to this many updates old. "
+                    "The default of 1 overlaps the generation of the next rollout with the training of this one."
+                ),
+            )
             parser.add_argument(
                 "--keep-old-actor",
                 action="store_true",
@@ -569,6 +723,15 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
             parser.add_argument("--entropy-coef", type=float, default=0.0, help="Entropy loss coef")
             parser.add_argument("--gamma", type=float, default=1.0, help="Discount factor for rewards in REINFORCE++.")
             parser.add_argument("--normalize-advantages", action="store_true", default=False)
+            parser.add_argument(
+                "--max-weight-staleness",
+                type=int,
+                default=None,
+                help=(
+                    "The samples generated by weights more than this many updates older than the trained ones "
+                    "get zero advantages, e.g. with --rollout-pipeline-depth or the partial rollouts."
+                ),
+            )
             parser.add_argument(
                 "--disable-grpo-std-normalization",
                 action="store_false",
@@ -644,7 +807,9 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                 default=None,
                 help=(
                     "Save the rollout data to this path for debugging. "
-                    "The file will be saved to `save_debug_rollout_data.format(rollout_id)`."
+                    "The file will be saved to `save_debug_rollout_data.format(rollout_id)`. "
+                    "If the path ends with `.pt`, the samples are saved with `torch.save`, "
+                    "otherwise they are saved as a memory mapped rollout archive directory, which is much faster to load."
                 ),
             )
             parser.add_argument(
@@ -653,7 +818,8 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                 default=None,
                 help=(
                     "Load the rollout data from this path for debugging. "
-                    "The file will be loaded from `load_debug_rollout_data.format(rollout_id)`. "
+                    "The file will be loaded from `load_debug_rollout_data.format(rollout_id)`, "
+                    "either a rollout archive directory or a `.pt` file. "
                     "When this is enabled, slime will not instantiate sglang servers."
                 ),
             )
@@ -695,6 +861,28 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
         def add_network_arguments(parser):
             parser.add_argument("--http-proxy", type=str, default=None)
             parser.add_argument("--use-http2", action="store_true", default=False)
+            parser.add_argument(
+                "--http-max-connections",
+                type=int,
+                default=None,
+                help=(
+                    "The max number of connections of the pooled http client used for rollout. "
+                    "By default, it is the max number of concurrent generation requests, "
+                    "i.e. sglang_server_concurrency * rollout_num_gpus // rollout_num_gpus_per_engine."
+                ),
+            )
+            parser.add_argument(
+                "--http-keepalive-expiry",
+                type=float,
+                default=60,
+                help="The time in seconds to keep the idle connections of the pooled http client alive.",
+            )
+            parser.add_argument(
+                "--http-max-retries",
+                type=int,
+                default=60,
+                help="The max number of attempts of a http request during rollout, retried with jittered backoff.",
+            )
             return parser
 
         def add_reward_model_arguments(parser):
@@ -728,6 +916,72 @@ def get_slime_extra_args_provider(add_custom_arguments=None):
                 default=None,
                 help="URL for the reward model service for --rm-type remote_rm, e.g. http://localhost:8000",
             )
+            parser.add_argument(
+                "--rm-batch-url",
+                type=str,
+                default=None,
+                help=(
+                    "URL of the batch endpoint of the reward model service for --rm-type remote_rm. "
+                    "If set, the concurrent requests are coalesced into micro-batches posted to this url, "
+                    "which receives a list of the payloads of --rm-url and returns the list of the rewards."
+                ),
+            )
+            parser.add_argument(
+                "--rm-max-batch-size",
+                type=int,
+                default=32,
+                help="The max number of samples in a micro-batch posted to --rm-batch-url.",
+            )
+            parser.add_argument(
+                "--rm-batch-window",
+                type=float,
+                default=0.01,
+                help=(
+                    "The max time in seconds to wait for more samples before posting a micro-batch "
+                    "to --rm-batch-url that is not full."
+                ),
+            )
+            parser.add_argument(
+                "--rm-max-connections",
+                type=int,
+                default=100,
+                help="The max number of concurrent connections to the reward model service.",
+            )
+            parser.add_argument(
+                "--rm-num-workers",
+                type=int,
+                default=0,
+                help=(
+                    "The number of processes to compute the rule-based rewards (e.g. deepscaler, dapo, math, f1) in, "
+                    "so that grading does not block the rollout event loop and runs on multiple cores. "
+                    "If 0, the rewards are computed in the event loop."
+                ),
+            )
+            parser.add_argument(
+                "--rm-timeout",
+                type=float,
+                default=10,
+                help=(
+                    "The timeout in seconds of computing a rule-based reward in the process pool. "
+                    "A reward that times out is 0."
+                ),
+            )
+            parser.add_argument(
+                "--rm-cache-size",
+                type=int,
+                default=100000,
+                help=(
+                    "The max number of entries of the LRU cache of the rule-based rewards, "
+                    "keyed by the rm type, the extracted answer of the response and the label. "
+                    "Set to 0 to disable the cache."
+                ),
+            )
+            parser.add_argument(
+                "--rm-cache-path",
+                type=str,
+                default=None,
+                help="If set, the reward cache is persisted to this jsonl file and loaded from it on restart.",
+            )
             parser.add_argument(
                 "--custom-rm-path",
                 type=str,
@@ -953,6 +1207,21 @@ def parse_args(add_custom_arguments=None):
         f"rollout_batch_size {args.rollout_batch_size}"
     )
 
+    if args.rollout_streaming:
+        assert (
+            args.over_sampling_filter_path is None
+        ), "--rollout-streaming is not compatible with the over sampling filter."
+        assert args.global_batch_size % args.n_samples_per_prompt == 0, (
+            f"global_batch_size {args.global_batch_size} should be a multiple of "
+            f"n_samples_per_prompt {args.n_samples_per_prompt} to stream the rollout by groups"
+        )
+
+    assert args.rollout_num_workers >= 1 and args.rollout_batch_size >= args.rollout_num_workers, (
+        f"rollout_num_workers {args.rollout_num_workers} should be between 1 and "
+        f"rollout_batch_size {args.rollout_batch_size}"
+    )
+    assert args.rollout_pipeline_depth >= 1, f"rollout_pipeline_depth {args.rollout_pipeline_depth} should be at least 1"
+
     if args.num_epoch is not None:
         if args.num_rollout is not None:
             print("Both num_epoch and num_rollout are set, num_epoch will be ignored.")
@@ -1,7 +1,9 @@
 import asyncio
 import threading
+from collections import deque
+from typing import Optional
 
-__all__ = ["get_async_loop", "run"]
+__all__ = ["AdaptiveSemaphore", "get_async_loop", "run"]
 
 
 # Create a background event loop thread
@@ -34,3 +36,134 @@ def get_async_loop():
 def run(coro):
     """Run a coroutine in the background event loop."""
     return get_async_loop().run(coro)
+
+
+class AdaptiveSemaphore:
+    """
+    A semaphore whose limit is adjusted by AIMD on the measured latency per output token.
+
+    Every `window` finished requests, the mean latency per output token of the window is compared with
+    the best one seen so far. While it stays within `(1 + tolerance)` of the best, the engines are not
+    saturated and the limit is increased by `increase`. Otherwise requests are queueing or being
+    preempted in the engines, and the limit is multiplied by `decrease_factor`.
+
+    It can be used in place of `asyncio.Semaphore`.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        increase: int = 1,
+        decrease_factor: float = 0.9,
+        tolerance: float = 0.5,
+    ):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else initial_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.tolerance = tolerance
+
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # the best latency per token of a window, drifting upwards slowly to follow changes of the workload.
+        self.baseline = None
+        self._window_latency = 0.0
+        self._window_tokens = 0
+        self._window_requests = 0
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._num_increases = 0
+        self._num_decreases = 0
+        self._max_in_flight = self.in_flight
+        self._last_window_latency_per_token = None
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self.in_flight)
+            return True
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            # the slot is taken on behalf of the waiter when the future is resolved.
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_up_waiters()
+
+    def _wake_up_waiters(self):
+        while self._waiters and self.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            future.set_result(None)
+            self.in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self.in_flight)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def record(self, latency: float, num_tokens: int):
+        """
+        Record a finished request that took `latency` seconds to generate `num_tokens` tokens per sequence.
+        """
+        if num_tokens <= 0:
+            return
+        self._window_latency += latency
+        self._window_tokens += num_tokens
+        self._window_requests += 1
+        if self._window_requests < max(self.increase, self.limit // 4):
+            return
+
+        latency_per_token = self._window_latency / self._window_tokens
+        self._window_latency, self._window_tokens, self._window_requests = 0.0, 0, 0
+        self._last_window_latency_per_token = latency_per_token
+        if self.baseline is None:
+            self.baseline = latency_per_token
+        else:
+            self.baseline = min(latency_per_token, self.baseline * 1.01)
+
+        if latency_per_token <= self.baseline * (1 + self.tolerance):
+            new_limit = min(self.max_limit, self.limit + self.increase)
+            self._num_increases += new_limit > self.limit
+        else:
+            new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            self._num_decreases += new_limit < self.limit
+        self.limit = new_limit
+        self._wake_up_waiters()
+
+    def get_metrics(self, reset=True) -> dict:
+        """
+        Return the state and the decisions of the controller since the last reset.
+        """
+        metrics = {
+            "limit": self.limit,
+            "max_in_flight": self._max_in_flight,
+            "num_increases": self._num_increases,
+            "num_decreases": self._num_decreases,
+        }
+        if self.baseline is not None:
+            metrics["baseline_latency_per_token"] = self.baseline
+        if self._last_window_latency_per_token is not None:
+            metrics["latency_per_token"] = self._last_window_latency_per_token
+        if reset:
+            self._reset_metrics()
+        return metrics
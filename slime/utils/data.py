@@ -1,26 +1,294 @@
+import hashlib
+import json
+import multiprocessing
+import os
 import random
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 
-from datasets import Dataset as hf_ds
+import numpy as np
 
 from slime.utils.types import Sample
 
 __all__ = ["Dataset"]
 
 
-# TODO: don't read the whole file into memory.
-def read_file(path):
+class JsonlReader:
+    """
+    Random access to the rows of a jsonl file.
+
+    Only the byte offset of each row is kept in memory, the row itself is read and parsed on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        offsets = []
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    offsets.append(offset)
+                offset += len(line)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self._file = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(self.offsets[idx])
+        return json.loads(self._file.readline())
+
+    def __iter__(self):
+        # sequential scan, no need to seek for every row.
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class ParquetReader:
+    """
+    Random access to the rows of a parquet file.
+
+    The row group boundaries are used as the index and the most recently used row groups are kept decoded.
+    """
+
+    def __init__(self, path, num_cached_row_groups=8):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self._file = pq.ParquetFile(path)
+        metadata = self._file.metadata
+        row_group_sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        self.row_group_offsets = np.cumsum([0] + row_group_sizes, dtype=np.int64)
+        self.num_cached_row_groups = num_cached_row_groups
+        self._cached_row_groups = OrderedDict()
+
+    def __len__(self):
+        return int(self.row_group_offsets[-1])
+
+    def _get_row_group(self, row_group_id):
+        if row_group_id in self._cached_row_groups:
+            self._cached_row_groups.move_to_end(row_group_id)
+        else:
+            self._cached_row_groups[row_group_id] = self._file.read_row_group(row_group_id)
+            if len(self._cached_row_groups) > self.num_cached_row_groups:
+                self._cached_row_groups.popitem(last=False)
+        return self._cached_row_groups[row_group_id]
+
+    def __getitem__(self, idx):
+        row_group_id = int(np.searchsorted(self.row_group_offsets, idx, side="right")) - 1
+        table = self._get_row_group(row_group_id)
+        return table.slice(idx - int(self.row_group_offsets[row_group_id]), 1).to_pylist()[0]
+
+    def __iter__(self):
+        for batch in self._file.iter_batches():
+            yield from batch.to_pylist()
+
+
+def get_reader(path):
     if path.endswith(".jsonl") or path.endswith(".json"):
-        ds = hf_ds.from_json(path)
+        return JsonlReader(path)
     elif path.endswith(".parquet"):
-        ds = hf_ds.from_parquet(path)
+        return ParquetReader(path)
     else:
         raise ValueError(f"Unsupported file format: {path}. Supported formats are .jsonl and .parquet.")
 
-    for data in ds:
-        yield data
+
+def read_file(path):
+    yield from get_reader(path)
+
+
+def get_prompt(data, tokenizer, prompt_key, tool_key=None, apply_chat_template=False):
+    prompt = data[prompt_key]
+    if apply_chat_template:
+        if tool_key is not None:
+            tools = data[tool_key]
+        else:
+            tools = None
+        prompt = tokenizer.apply_chat_template(prompt, tools, tokenize=False, add_generation_prompt=True)
+    return prompt
+
+
+# The worst case growth of the utf-8 length of a string under unicode normalization, see
+# https://unicode.org/reports/tr15/#Stabilizing_Strings
+_NORMALIZER_EXPANSION = {None: 1, "NFC": 3, "NFD": 3, "NFKC": 11, "NFKD": 11}
+
+
+def get_max_tokens_per_byte(tokenizer):
+    """
+    Return `k` so that a prompt of `n` utf-8 bytes is never tokenized into more than `k * n + 1` tokens
+    (without special tokens), or None if no such bound is known for the tokenizer.
+
+    Every token of a byte-level BPE or a sentencepiece with byte fallback covers at least one byte
+    of the normalized text, and the extra 1 is for the prefix space added by some sentencepiece models.
+    """
+    backend_tokenizer = getattr(tokenizer, "backend_tokenizer", None)
+    if backend_tokenizer is None:
+        return None
+    normalizer = backend_tokenizer.normalizer
+    normalizer_type = None if normalizer is None else type(normalizer).__name__
+    return _NORMALIZER_EXPANSION.get(normalizer_type, None)
+
+
+_WORKER_TOKENIZER = None
+
+
+def _init_prompt_worker(tokenizer):
+    global _WORKER_TOKENIZER
+    _WORKER_TOKENIZER = tokenizer
+
+
+def filter_prompts(rows, max_length, prompt_key, tool_key=None, apply_chat_template=False, tokenizer=None):
+    """
+    Return whether each of the rows has a prompt not longer than `max_length` tokens.
+
+    The prompts that are provably short enough by their utf-8 length are not tokenized,
+    the others are tokenized in one batch.
+    """
+    if tokenizer is None:
+        tokenizer = _WORKER_TOKENIZER
+
+    prompts = [get_prompt(data, tokenizer, prompt_key, tool_key, apply_chat_template) for data in rows]
+    keep = [True] * len(prompts)
+
+    max_tokens_per_byte = get_max_tokens_per_byte(tokenizer)
+    if max_tokens_per_byte is None:
+        unsure = list(range(len(prompts)))
+    else:
+        budget = max_length - tokenizer.num_special_tokens_to_add() - 1
+        unsure = [i for i, prompt in enumerate(prompts) if max_tokens_per_byte * len(prompt.encode()) > budget]
+
+    if unsure:
+        input_ids = tokenizer([prompts[i] for i in unsure])["input_ids"]
+        for i, ids in zip(unsure, input_ids):
+            keep[i] = len(ids) <= max_length
+    return keep
+
+
+def tokenize_prompts(rows, prompt_key, tool_key=None, apply_chat_template=False, tokenizer=None):
+    """
+    Return the rendered prompts of the rows and their token ids (without special tokens).
+    """
+    if tokenizer is None:
+        tokenizer = _WORKER_TOKENIZER
+
+    prompts = [get_prompt(data, tokenizer, prompt_key, tool_key, apply_chat_template) for data in rows]
+    input_ids = tokenizer(prompts, add_special_tokens=False)["input_ids"]
+    return prompts, input_ids
+
+
+class PromptCache:
+    """
+    On-disk cache of the rendered prompts, their token ids and the result of the prompt length filter.
+
+    All rows of the file are stored as flat arrays with offsets, which are memory mapped when loaded,
+    so that the actors on the same node share the pages of the cache.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.keep = np.load(os.path.join(path, "keep.npy"), mmap_mode="r")
+        self.prompt_offsets = np.load(os.path.join(path, "prompt_offsets.npy"), mmap_mode="r")
+        self.token_offsets = np.load(os.path.join(path, "token_offsets.npy"), mmap_mode="r")
+        self.prompts = self._memmap(os.path.join(path, "prompts.bin"), np.uint8)
+        self.token_ids = self._memmap(os.path.join(path, "token_ids.bin"), np.int32)
+
+    @staticmethod
+    def _memmap(path, dtype):
+        # np.memmap does not support empty files.
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return len(self.keep)
+
+    def get_prompt(self, row_id):
+        return bytes(self.prompts[self.prompt_offsets[row_id] : self.prompt_offsets[row_id + 1]]).decode("utf-8")
+
+    def get_token_ids(self, row_id):
+        return self.token_ids[self.token_offsets[row_id] : self.token_offsets[row_id + 1]]
+
+    @staticmethod
+    def get_path(cache_dir, path, tokenizer, **config):
+        stat = os.stat(path)
+        backend_tokenizer = getattr(tokenizer, "backend_tokenizer", None)
+        if backend_tokenizer is not None:
+            tokenizer_content = backend_tokenizer.to_str()
+        else:
+            tokenizer_content = json.dumps(sorted(tokenizer.get_vocab().items()))
+        key = {
+            "version": PromptCache.VERSION,
+            "path": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "tokenizer": hashlib.sha256(tokenizer_content.encode()).hexdigest(),
+            "chat_template": str(getattr(tokenizer, "chat_template", None)),
+            **config,
+        }
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+        return os.path.join(cache_dir, f"{os.path.basename(path)}-{digest}")
+
+    @staticmethod
+    def build(path, results, num_special_tokens, max_length=None):
+        """
+        Write the cache to `path` from an iterator of `(prompts, input_ids)` chunks.
+
+        The cache is written to a temporary directory first, so that concurrent builders and
+        readers never see a partial cache.
+        """
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+
+        keep = []
+        prompt_offsets = [0]
+        token_offsets = [0]
+        with open(os.path.join(tmp_path, "prompts.bin"), "wb") as prompt_file, open(
+            os.path.join(tmp_path, "token_ids.bin"), "wb"
+        ) as token_file:
+            for prompts, input_ids in results:
+                for prompt, ids in zip(prompts, input_ids):
+                    prompt = prompt.encode("utf-8")
+                    prompt_file.write(prompt)
+                    prompt_offsets.append(prompt_offsets[-1] + len(prompt))
+                    token_file.write(np.asarray(ids, dtype=np.int32).tobytes())
+                    token_offsets.append(token_offsets[-1] + len(ids))
+                    keep.append(max_length is None or len(ids) + num_special_tokens <= max_length)
+
+        np.save(os.path.join(tmp_path, "keep.npy"), np.array(keep, dtype=bool))
+        np.save(os.path.join(tmp_path, "prompt_offsets.npy"), np.array(prompt_offsets, dtype=np.int64))
+        np.save(os.path.join(tmp_path, "token_offsets.npy"), np.array(token_offsets, dtype=np.int64))
+
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process has finished building the same cache.
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return PromptCache(path)
+
+
+def _chunked(iterable, chunk_size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
 
 
 class Dataset:
+    """
+    A lazy prompt dataset.
+
+    Only an index over the rows of the file is built at initialization,
+    the `Sample` is materialized when it is accessed.
+    """
+
     def __init__(
         self,
         path,
@@ -33,46 +301,141 @@ class Dataset:
         metadata_key="metadata",
         seed=42,
         apply_chat_template=False,
+        num_workers=1,
+        chunk_size=4096,
+        cache_dir=None,
     ):
-        self.origin_samples = []
-        for data in read_file(path):
-            prompt = data[prompt_key]
-            if apply_chat_template:
-                if tool_key is not None:
-                    tools = data[tool_key]
-                else:
-                    tools = None
-                prompt = tokenizer.apply_chat_template(prompt, tools, tokenize=False, add_generation_prompt=True)
-
-            # TODO: this is slow.
-            if max_length is not None:
-                if len(tokenizer(prompt)["input_ids"]) > max_length:
-                    continue
-
-            self.origin_samples.append(
-                Sample(
-                    prompt=prompt,
-                    label=data[label_key] if label_key is not None else None,
-                    metadata=data.get(metadata_key) or {},
-                )
+        self.reader = get_reader(path)
+        self.tokenizer = tokenizer
+        self.prompt_key = prompt_key
+        self.label_key = label_key
+        self.tool_key = tool_key
+        self.metadata_key = metadata_key
+        self.apply_chat_template = apply_chat_template
+
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = self._load_or_build_cache(path, cache_dir, max_length, num_workers, chunk_size)
+            self.origin_indices = np.flatnonzero(self.cache.keep).astype(np.int64)
+        elif max_length is not None:
+            filter_kwargs = dict(
+                max_length=max_length,
+                prompt_key=self.prompt_key,
+                tool_key=self.tool_key,
+                apply_chat_template=self.apply_chat_template,
             )
+            keep = list(chain.from_iterable(self._map_chunks(filter_prompts, filter_kwargs, num_workers, chunk_size)))
+            self.origin_indices = np.flatnonzero(np.array(keep, dtype=bool)).astype(np.int64)
+        else:
+            self.origin_indices = np.arange(len(self.reader), dtype=np.int64)
 
         self.epoch_id = -1
         self.seed = seed
-        self.samples = self.origin_samples
+        self.indices = self.origin_indices
+
+    def _load_or_build_cache(self, path, cache_dir, max_length, num_workers, chunk_size):
+        cache_path = PromptCache.get_path(
+            cache_dir,
+            path,
+            self.tokenizer,
+            prompt_key=self.prompt_key,
+            tool_key=self.tool_key,
+            apply_chat_template=self.apply_chat_template,
+            max_length=max_length,
+        )
+        if os.path.exists(cache_path):
+            print(f"Load prompt cache from {cache_path}")
+            return PromptCache(cache_path)
+
+        print(f"Build prompt cache at {cache_path}")
+        os.makedirs(cache_dir, exist_ok=True)
+        tokenize_kwargs = dict(
+            prompt_key=self.prompt_key,
+            tool_key=self.tool_key,
+            apply_chat_template=self.apply_chat_template,
+        )
+        num_special_tokens = (
+            self.tokenizer.num_special_tokens_to_add() if hasattr(self.tokenizer, "num_special_tokens_to_add") else 0
+        )
+        return PromptCache.build(
+            cache_path,
+            self._map_chunks(tokenize_prompts, tokenize_kwargs, num_workers, chunk_size),
+            num_special_tokens,
+            max_length=max_length,
+        )
+
+    def _map_chunks(self, fn, fn_kwargs, num_workers, chunk_size):
+        """
+        Apply `fn` to the chunks of the rows in order, with a process pool if `num_workers > 1`.
+        """
+        # only send the fields needed for the prompt to the workers.
+        keys = [self.prompt_key] + ([self.tool_key] if self.apply_chat_template and self.tool_key is not None else [])
+        chunks = _chunked(({key: data[key] for key in keys} for data in self.reader), chunk_size)
+
+        if num_workers <= 1 or len(self.reader) <= chunk_size:
+            for chunk in chunks:
+                yield fn(chunk, tokenizer=self.tokenizer, **fn_kwargs)
+            return
+
+        # use spawn as the dataset is usually created in a process with running threads.
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_prompt_worker,
+            initargs=(self.tokenizer,),
+        ) as executor:
+            # bound the number of chunks in flight to keep the memory usage low.
+            pendings = []
+            for chunk in chunks:
+                pendings.append(executor.submit(fn, chunk, **fn_kwargs))
+                if len(pendings) >= 2 * num_workers:
+                    yield pendings.pop(0).result()
+            for future in pendings:
+                yield future.result()
+
+    def _get_prompt(self, data):
+        return get_prompt(data, self.tokenizer, self.prompt_key, self.tool_key, self.apply_chat_template)
+
+    def _get_sample(self, row_id):
+        row_id = int(row_id)
+        data = self.reader[row_id]
+        if self.cache is not None:
+            prompt = self.cache.get_prompt(row_id)
+            tokens = self.cache.get_token_ids(row_id).tolist()
+        else:
+            prompt = self._get_prompt(data)
+            # tokenize the prompt once here, so that generation doesn't need to tokenize it for every sample.
+            tokens = self.tokenizer(prompt, add_special_tokens=False)["input_ids"] if isinstance(prompt, str) else []
+        return Sample(
+            prompt=prompt,
+            tokens=tokens,
+            label=data[self.label_key] if self.label_key is not None else None,
+            metadata=data.get(self.metadata_key) or {},
+        )
+
+    @property
+    def samples(self):
+        # kept for backward compatibility, the dataset itself can be sliced and iterated.
+        return self
 
     def shuffle(self, new_epoch_id):
         if self.epoch_id == new_epoch_id:
             return
 
         random.seed(self.seed + new_epoch_id)
-        permutation = list(range(len(self.samples)))
+        permutation = list(range(len(self.origin_indices)))
         random.shuffle(permutation)
-        self.samples = [self.origin_samples[i] for i in permutation]
+        self.indices = self.origin_indices[permutation]
         self.epoch_id = new_epoch_id
 
     def __getitem__(self, idx):
-        return self.samples[idx]
+        if isinstance(idx, slice):
+            return [self._get_sample(row_id) for row_id in self.indices[idx]]
+        return self._get_sample(self.indices[idx])
+
+    def __iter__(self):
+        for row_id in self.indices:
+            yield self._get_sample(row_id)
 
     def __len__(self):
-        return len(self.samples)
+        return len(self.indices)
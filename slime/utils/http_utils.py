@@ -2,6 +2,7 @@ import asyncio
 import multiprocessing
 import random
 import socket
+import weakref
 
 import httpx
 
@@ -69,27 +70,72 @@ def terminate_process(process: multiprocessing.Process, timeout: float = 1.0) ->
         process.join()
 
 
-async def post(url, payload, use_http2=False, max_retries=60):
-    # never timeout
-    timeout = httpx.Timeout(None)
-    max_retries = 60
+# the pooled clients, one per event loop and http version, as a client can only be used in the loop it is created in.
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[bool, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_LIMITS = httpx.Limits(max_connections=None, max_keepalive_connections=None, keepalive_expiry=60)
+_MAX_RETRIES = 60
+_RETRY_BASE_DELAY = 0.1
+_RETRY_MAX_DELAY = 5.0
+
+
+def init_http_client(args):
+    """
+    Configure the pooled clients of `post` and `get`. Only affects the clients created afterwards.
+    """
+    global _LIMITS, _MAX_RETRIES
+    max_connections = args.http_max_connections
+    if max_connections is None:
+        # enough connections for all concurrent generation requests.
+        max_connections = args.sglang_server_concurrency * args.rollout_num_gpus // args.rollout_num_gpus_per_engine
+    _LIMITS = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=args.http_keepalive_expiry,
+    )
+    _MAX_RETRIES = args.http_max_retries
+
+
+def get_client(use_http2=False) -> httpx.AsyncClient:
+    """
+    Return the keep-alive client of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _CLIENTS.setdefault(loop, {})
+    client = clients.get(use_http2)
+    if client is None or client.is_closed:
+        # never timeout
+        client = httpx.AsyncClient(http1=not use_http2, http2=use_http2, timeout=httpx.Timeout(None), limits=_LIMITS)
+        clients[use_http2] = client
+    return client
+
+
+def _get_retry_delay(retry_count):
+    # exponential backoff with full jitter, so that the retries of concurrent requests do not come in waves.
+    return random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2**retry_count))
+
+
+async def post(url, payload, use_http2=False, max_retries=None):
+    if max_retries is None:
+        max_retries = _MAX_RETRIES
+    client = get_client(use_http2)
     retry_count = 0
     while retry_count < max_retries:
         try:
-            async with httpx.AsyncClient(http1=not use_http2, http2=use_http2, timeout=timeout) as client:
-                response = await client.post(url, json=payload or {})
-                response.raise_for_status()
-                try:
-                    output = response.json()
-                except:
-                    output = response.text
+            response = await client.post(url, json=payload or {})
+            response.raise_for_status()
+            try:
+                output = response.json()
+            except:
+                output = response.text
         except Exception as e:
             retry_count += 1
             print(f"Error: {e}, retrying... (attempt {retry_count}/{max_retries})")
             if retry_count >= max_retries:
                 print(f"Max retries ({max_retries}) reached, failing...")
                 raise e
-            await asyncio.sleep(1)
+            await asyncio.sleep(_get_retry_delay(retry_count))
             continue
         break
 
@@ -97,10 +143,7 @@ async def post(url, payload, use_http2=False, max_retries=60):
 
 
 async def get(url, use_http2=False):
-    # never timeout
-    timeout = httpx.Timeout(None)
-    async with httpx.AsyncClient(http1=not use_http2, http2=use_http2, timeout=timeout) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        output = response.json()
+    response = await get_client(use_http2).get(url)
+    response.raise_for_status()
+    output = response.json()
     return output
@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+from typing import Optional
+
+import numpy as np
+
+from slime.utils.types import Sample, SampleBatch
+
+__all__ = ["RolloutArchive"]
+
+
+class RolloutArchive:
+    """
+    A columnar, indexed archive of the samples of one rollout.
+
+    The archive is a directory with one `.npy` file per column of `SampleBatch`, which are memory mapped
+    when loaded, and a `records.jsonl` with the remaining fields of each sample (prompt, response, reward,
+    metadata, ...), indexed by the byte offset of each line. Loading the training data of a rollout is
+    therefore a few page faults, and single samples can be read at random without parsing the others.
+    """
+
+    VERSION = 1
+
+    _COLUMNS = [
+        "tokens",
+        "token_offsets",
+        "response_lengths",
+        "loss_mask_spans",
+        "loss_mask_span_offsets",
+        "rewards",
+        "truncated",
+        "sample_indices",
+    ]
+    _OPTIONAL_COLUMNS = ["raw_reward", "round_number", "weight_versions"]
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        assert (
+            self.meta["version"] == RolloutArchive.VERSION
+        ), f"rollout archive version {self.meta['version']} != {RolloutArchive.VERSION}"
+        self.columns = {}
+        for name in RolloutArchive._COLUMNS + RolloutArchive._OPTIONAL_COLUMNS:
+            column_path = os.path.join(path, f"{name}.npy")
+            if os.path.exists(column_path):
+                self.columns[name] = np.load(column_path, mmap_mode="r")
+        self.record_offsets = np.load(os.path.join(path, "record_offsets.npy"), mmap_mode="r")
+        self._positions = None
+
+    @staticmethod
+    def is_archive(path) -> bool:
+        return os.path.isfile(os.path.join(path, "meta.json"))
+
+    @property
+    def rollout_id(self) -> Optional[int]:
+        return self.meta["rollout_id"]
+
+    def __len__(self):
+        return self.meta["num_samples"]
+
+    def to_sample_batch(self) -> SampleBatch:
+        """
+        Return the training data of the rollout, backed by the memory mapped columns.
+        """
+        return SampleBatch(**self.columns)
+
+    def get_record(self, i: int) -> dict:
+        with open(os.path.join(self.path, "records.jsonl"), "rb") as f:
+            f.seek(self.record_offsets[i])
+            return json.loads(f.read(self.record_offsets[i + 1] - self.record_offsets[i]))
+
+    def get_sample(self, i: int) -> Sample:
+        """
+        Rebuild the i-th sample of the archive.
+        """
+        batch = self.to_sample_batch()
+        record = self.get_record(i)
+        record["tokens"] = batch.get_tokens(i).tolist()
+        if record.pop("has_loss_mask"):
+            record["loss_mask"] = batch.get_loss_mask(i).tolist()
+        return Sample.from_dict(record)
+
+    def __getitem__(self, i: int) -> Sample:
+        return self.get_sample(i)
+
+    def find(self, sample_index) -> list[int]:
+        """
+        Return the positions in the archive of the samples with `sample.index == sample_index`.
+        """
+        if self._positions is None:
+            self._positions = {}
+            for i, index in enumerate(self.columns["sample_indices"].tolist()):
+                self._positions.setdefault(index, []).append(i)
+        return self._positions.get(sample_index, [])
+
+    @staticmethod
+    def write(path, samples: list[Sample], rewards: list[float], rollout_id: Optional[int] = None):
+        """
+        Write the samples of a rollout to an archive at `path`, replacing any existing one.
+
+        `rewards` are the reward values used for training, e.g. `sample.get_reward_value(args)`.
+        """
+        batch = SampleBatch.from_samples(samples, rewards)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+
+        for name in RolloutArchive._COLUMNS + RolloutArchive._OPTIONAL_COLUMNS:
+            value = getattr(batch, name)
+            if value is None:
+                continue
+            # keep the archive loadable without pickle.
+            if value.dtype == object:
+                value = value.astype(str)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), value, allow_pickle=False)
+
+        record_offsets = [0]
+        with open(os.path.join(tmp_path, "records.jsonl"), "wb") as f:
+            for sample in samples:
+                record = sample.to_dict()
+                # the tokens and the loss mask are already in the columns.
+                del record["tokens"]
+                record["has_loss_mask"] = record.pop("loss_mask") is not None
+                line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                f.write(line)
+                record_offsets.append(record_offsets[-1] + len(line))
+        np.save(os.path.join(tmp_path, "record_offsets.npy"), np.array(record_offsets, dtype=np.int64))
+
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"version": RolloutArchive.VERSION, "rollout_id": rollout_id, "num_samples": len(samples)}, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
@@ -1,17 +1,20 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields, replace
 from enum import Enum
+from itertools import chain
 from typing import Optional, Union, Any
 
+import numpy as np
 import torch
 
 
-@dataclass
+@dataclass(slots=True)
 class Sample:
     """The sample generated"""
 
     index: Optional[int] = None
     # prompt
     prompt: Union[str, list[dict[str, str]]] = ""
+    # the prompt token ids followed by the response token ids generated so far.
     tokens: list[int] = field(default_factory=list)
     # response
     response: str = ""
@@ -29,8 +32,18 @@ class Sample:
     status: Status = Status.PENDING
     metadata: dict = field(default_factory=dict)
 
+    def clone(self, **changes) -> "Sample":
+        """
+        Return a lightweight copy of the sample, e.g. for the samples generated from the same prompt.
+
+        The prompt, tokens and label are shared with this sample and the metadata is shallow copied,
+        so they should be reassigned instead of modified in place.
+        """
+        changes.setdefault("metadata", dict(self.metadata))
+        return replace(self, **changes)
+
     def to_dict(self):
-        value = self.__dict__.copy()
+        value = {f.name: getattr(self, f.name) for f in fields(self)}
         value["status"] = self.status.value
         return value
 
@@ -43,6 +56,169 @@ class Sample:
         return self.reward if not args.reward_key else self.reward[args.reward_key]
 
 
+def get_loss_mask_spans(loss_mask) -> np.ndarray:
+    """
+    Run-length encode a 0/1 loss mask into the [start, end) spans of ones, of shape (num_spans, 2).
+    """
+    mask = np.asarray(loss_mask) != 0
+    edges = np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8))
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+
+def expand_loss_mask_spans(spans: np.ndarray, length: int) -> np.ndarray:
+    """
+    The inverse of `get_loss_mask_spans`.
+    """
+    mask = np.zeros(length, dtype=np.int8)
+    for start, end in spans:
+        mask[start:end] = 1
+    return mask
+
+
+@dataclass
+class SampleBatch:
+    """
+    The columnar format of the samples of a rollout for training.
+
+    The tokens of all samples are stored in a flat array, so that creating, pickling and unpacking the batch
+    are a few buffer copies instead of handling one python object per token. The loss masks are stored as
+    the spans of ones and only expanded to dense masks on the training side.
+    """
+
+    # the tokens of sample i are tokens[token_offsets[i] : token_offsets[i + 1]]
+    tokens: np.ndarray
+    token_offsets: np.ndarray
+    response_lengths: np.ndarray
+    # the loss mask of sample i is ones in the [start, end) spans of
+    # loss_mask_spans[loss_mask_span_offsets[i] : loss_mask_span_offsets[i + 1]],
+    # relative to the start of the response, and zeros elsewhere.
+    loss_mask_spans: np.ndarray
+    loss_mask_span_offsets: np.ndarray
+    rewards: np.ndarray
+    truncated: np.ndarray
+    sample_indices: np.ndarray
+    raw_reward: Optional[np.ndarray] = None
+    round_number: Optional[np.ndarray] = None
+    # the version of the weights that generated each sample, counted in weight updates.
+    weight_versions: Optional[np.ndarray] = None
+    # the total lengths of the whole rollout batch, when this batch is the shard of a data parallel rank.
+    rollout_total_lengths: Optional[np.ndarray] = None
+
+    @staticmethod
+    def from_samples(samples: list[Sample], rewards: list[float]) -> "SampleBatch":
+        total_lengths = np.fromiter((len(sample.tokens) for sample in samples), dtype=np.int64, count=len(samples))
+        token_offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        np.cumsum(total_lengths, out=token_offsets[1:])
+        tokens = np.fromiter(
+            chain.from_iterable(sample.tokens for sample in samples), dtype=np.int32, count=int(token_offsets[-1])
+        )
+
+        loss_mask_spans = []
+        for sample in samples:
+            # the loss mask defaults to all ones, which is a single span.
+            if sample.loss_mask is None:
+                spans = [[0, sample.response_length]] if sample.response_length > 0 else []
+                loss_mask_spans.append(np.array(spans, dtype=np.int64).reshape(-1, 2))
+                continue
+            assert (
+                len(sample.loss_mask) == sample.response_length
+            ), f"loss mask length {len(sample.loss_mask)} != response length {sample.response_length}"
+            loss_mask_spans.append(get_loss_mask_spans(sample.loss_mask))
+        loss_mask_span_offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        np.cumsum([len(spans) for spans in loss_mask_spans], out=loss_mask_span_offsets[1:])
+
+        batch = SampleBatch(
+            tokens=tokens,
+            token_offsets=token_offsets,
+            response_lengths=np.fromiter(
+                (sample.response_length for sample in samples), dtype=np.int64, count=len(samples)
+            ),
+            loss_mask_spans=np.concatenate(loss_mask_spans).astype(np.int64),
+            loss_mask_span_offsets=loss_mask_span_offsets,
+            rewards=np.asarray(rewards, dtype=np.float64),
+            truncated=np.array([sample.status == Sample.Status.TRUNCATED for sample in samples], dtype=np.int8),
+            sample_indices=np.asarray([sample.index for sample in samples]),
+        )
+
+        # overwriting the raw reward
+        if samples[0].metadata and "raw_reward" in samples[0].metadata:
+            batch.raw_reward = np.asarray([sample.metadata["raw_reward"] for sample in samples], dtype=np.float64)
+
+        # For rollout buffer
+        if samples[0].metadata and "round_number" in samples[0].metadata:
+            batch.round_number = np.asarray([sample.metadata["round_number"] for sample in samples])
+
+        if samples[0].metadata and "weight_version" in samples[0].metadata:
+            batch.weight_versions = np.asarray(
+                [sample.metadata.get("weight_version", 0) for sample in samples], dtype=np.int64
+            )
+        return batch
+
+    def __len__(self):
+        return len(self.response_lengths)
+
+    @property
+    def total_lengths(self) -> np.ndarray:
+        return np.diff(self.token_offsets)
+
+    def get_tokens(self, i: int) -> np.ndarray:
+        return self.tokens[self.token_offsets[i] : self.token_offsets[i + 1]]
+
+    def get_loss_mask(self, i: int) -> np.ndarray:
+        spans = self.loss_mask_spans[self.loss_mask_span_offsets[i] : self.loss_mask_span_offsets[i + 1]]
+        return expand_loss_mask_spans(spans, self.response_lengths[i])
+
+    def select(self, indices) -> "SampleBatch":
+        """
+        Return a new batch of the samples at `indices`, in that order.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+
+        def gather(values, offsets):
+            starts, ends = offsets[indices], offsets[indices + 1]
+            new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+            np.cumsum(ends - starts, out=new_offsets[1:])
+            # build the positions of all selected elements at once.
+            positions = np.repeat(starts - new_offsets[:-1], ends - starts) + np.arange(new_offsets[-1])
+            return values[positions], new_offsets
+
+        tokens, token_offsets = gather(self.tokens, self.token_offsets)
+        loss_mask_spans, loss_mask_span_offsets = gather(self.loss_mask_spans, self.loss_mask_span_offsets)
+        return SampleBatch(
+            tokens=tokens,
+            token_offsets=token_offsets,
+            response_lengths=self.response_lengths[indices],
+            loss_mask_spans=loss_mask_spans,
+            loss_mask_span_offsets=loss_mask_span_offsets,
+            rewards=self.rewards[indices],
+            truncated=self.truncated[indices],
+            sample_indices=self.sample_indices[indices],
+            raw_reward=None if self.raw_reward is None else self.raw_reward[indices],
+            round_number=None if self.round_number is None else self.round_number[indices],
+            weight_versions=None if self.weight_versions is None else self.weight_versions[indices],
+        )
+
+    def to_dict(self) -> dict[str, list]:
+        """
+        Return the batch in the format of a dict of lists, one element per sample.
+        """
+        data = {
+            "tokens": [self.get_tokens(i).tolist() for i in range(len(self))],
+            "response_lengths": self.response_lengths.tolist(),
+            "rewards": self.rewards.tolist(),
+            "truncated": self.truncated.tolist(),
+            "sample_indices": self.sample_indices.tolist(),
+            "loss_masks": [self.get_loss_mask(i).tolist() for i in range(len(self))],
+        }
+        if self.raw_reward is not None:
+            data["raw_reward"] = self.raw_reward.tolist()
+        if self.round_number is not None:
+            data["round_number"] = self.round_number.tolist()
+        if self.weight_versions is not None:
+            data["weight_versions"] = self.weight_versions.tolist()
+        return data
+
+
 @dataclass
 class ParamInfo:
     name: str
@@ -0,0 +1,114 @@
+"""
+Check that the fast paths of `grade_answer_sympy` give the same verdicts as the full sympy comparison,
+and benchmark the graded answers per second on one core.
+
+    python tools/benchmark_math_grader.py
+    python tools/benchmark_math_grader.py --corpus answers.jsonl  # lines of {"given": ..., "ground_truth": ...}
+"""
+
+import json
+import random
+import time
+from argparse import ArgumentParser
+
+from slime.rollout.rm_hub.math_utils import grade_answer_sympy
+
+
+def generate_corpus(num_pairs, seed=0):
+    rng = random.Random(seed)
+
+    def number():
+        kind = rng.randrange(6)
+        n = rng.randint(-1000, 1000)
+        d = rng.randint(1, 12)
+        if kind == 0:
+            return str(n)
+        if kind == 1:
+            return f"{n / d:.{rng.randint(1, 6)}f}"
+        if kind == 2:
+            return f"{n}/{d}"
+        if kind == 3:
+            return f"\\frac{{{n}}}{{{d}}}"
+        if kind == 4:
+            return f"{rng.choice(['', '-'])}{rng.randint(1, 9)}\\sqrt{{{rng.randint(2, 50)}}}"
+        return f"{rng.randint(1, 9)}\\pi"
+
+    def variant(answer):
+        # the same value written differently, or a close but different value.
+        kind = rng.randrange(8)
+        if kind == 0:
+            return answer
+        if kind == 1 and "/" in answer and "\\" not in answer:
+            n, d = answer.split("/")
+            return f"\\frac{{{n}}}{{{d}}}"
+        if kind == 2:
+            try:
+                return str(float(answer))
+            except ValueError:
+                return answer
+        if kind == 3:
+            return f"{answer}0" if "." in answer else f"{answer}.0"
+        if kind == 4:
+            return f"\\text{{{answer}}}"
+        if kind == 5:
+            return f"{answer}^\\circ"
+        if kind == 6:
+            return f"({answer}, {number()})"
+        return number()
+
+    corpus = []
+    for _ in range(num_pairs):
+        ground_truth = number() if rng.random() < 0.9 else f"({number()}, {number()})"
+        corpus.append((variant(ground_truth), ground_truth))
+    # some hand picked edge cases.
+    corpus += [
+        ("0.5", "1/2"),
+        ("1/2", "0.5"),
+        ("0.333333333333333", "1/3"),
+        ("0.1000000000000000000001", "0.1"),
+        ("2/4", "1/2"),
+        ("1/0", "1/0"),
+        ("-0", "0"),
+        (".5", "0.5"),
+        ("5.", "5"),
+        ("1,000", "1000"),
+        ("10^3", "1000"),
+        ("x+1", "1+x"),
+        ("\\infty", "\\infty"),
+        ("", "1"),
+    ]
+    return corpus
+
+
+def benchmark(corpus, fast_path, repeats):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        verdicts = [grade_answer_sympy(given, ground_truth, fast_path=fast_path) for given, ground_truth in corpus]
+    elapsed = time.perf_counter() - start_time
+    return verdicts, len(corpus) * repeats / elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None, help="jsonl file with `given` and `ground_truth`.")
+    parser.add_argument("--num-pairs", type=int, default=2000, help="size of the generated corpus.")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.corpus is not None:
+        with open(args.corpus) as f:
+            corpus = [(str(item["given"]), str(item["ground_truth"])) for item in map(json.loads, f)]
+    else:
+        corpus = generate_corpus(args.num_pairs, args.seed)
+
+    reference, reference_speed = benchmark(corpus, fast_path=False, repeats=args.repeats)
+    verdicts, speed = benchmark(corpus, fast_path=True, repeats=args.repeats)
+
+    mismatches = [(pair, ref) for pair, ref, verdict in zip(corpus, reference, verdicts) if ref != verdict]
+    for (given, ground_truth), ref in mismatches:
+        print(f"MISMATCH given={given!r} ground_truth={ground_truth!r} sympy={ref} fast_path={not ref}")
+    print(f"{len(corpus)} pairs, {sum(reference)} correct, {len(mismatches)} mismatches")
+    print(f"sympy only: {reference_speed:.1f} answers/s, with fast path: {speed:.1f} answers/s")
+    if mismatches:
+        raise SystemExit(1)
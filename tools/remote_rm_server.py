@@ -0,0 +1,106 @@
+"""
+A stand-in reward model server for --rm-type remote_rm, to benchmark the remote rm client without a real
+reward model. Each forward takes `--latency + --per-sample-latency * batch_size` seconds, one at a time,
+like a reward model on a single GPU.
+
+    python tools/remote_rm_server.py serve --port 8000 --latency 0.02 --per-sample-latency 0.001
+    # then train with --rm-type remote_rm --rm-url http://localhost:8000/reward \
+    #     --rm-batch-url http://localhost:8000/batch
+    python tools/remote_rm_server.py benchmark --url http://localhost:8000/reward \
+        --batch-url http://localhost:8000/batch --num-samples 4096 --concurrency 512
+"""
+
+import asyncio
+import time
+from argparse import ArgumentParser
+
+from slime.rollout.rm_hub import rule_based_rm
+from slime.rollout.rm_hub.remote_rm import RemoteRMClient
+from slime.utils.types import Sample
+
+
+def create_app(latency, per_sample_latency, rm_type=None):
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+    lock = asyncio.Lock()
+
+    async def forward(payloads):
+        async with lock:
+            await asyncio.sleep(latency + per_sample_latency * len(payloads))
+        if rm_type is not None:
+            return [rule_based_rm(rm_type, payload["response"], payload["label"]) for payload in payloads]
+        # a fake reward that only depends on the response.
+        return [len(payload["response"]) % 2 for payload in payloads]
+
+    @app.post("/reward")
+    async def reward(request: Request):
+        return (await forward([await request.json()]))[0]
+
+    @app.post("/batch")
+    async def batch(request: Request):
+        return await forward(await request.json())
+
+    return app
+
+
+async def benchmark(url, batch_url, num_samples, concurrency, max_batch_size, batch_window):
+    samples = [Sample(index=i, prompt=f"prompt {i}", response=f"response {i}", label="1") for i in range(num_samples)]
+    for name, client in [
+        ("per-sample", RemoteRMClient(url)),
+        ("batched", RemoteRMClient(url, batch_url=batch_url, max_batch_size=max_batch_size, batch_window=batch_window)),
+    ]:
+        if name == "batched" and batch_url is None:
+            continue
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def score(sample):
+            async with semaphore:
+                return await client.score(sample)
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(score(sample) for sample in samples))
+        elapsed = time.perf_counter() - start_time
+        metrics = client.get_metrics()
+        print(
+            f"{name}: {num_samples / elapsed:.1f} samples/s, {metrics['requests']} requests, "
+            f"mean batch size {metrics.get('mean_batch_size', 0):.1f}"
+        )
+        await client.session.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the stand-in reward model server.")
+    serve_parser.add_argument("--host", type=str, default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--latency", type=float, default=0.02, help="The fixed cost of a forward.")
+    serve_parser.add_argument("--per-sample-latency", type=float, default=0.001, help="The cost per sample.")
+    serve_parser.add_argument(
+        "--rm-type",
+        type=str,
+        default=None,
+        help="If set, compute the rewards with this rule-based rm, e.g. math, instead of a fake reward.",
+    )
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Benchmark the remote rm client against a server.")
+    benchmark_parser.add_argument("--url", type=str, required=True)
+    benchmark_parser.add_argument("--batch-url", type=str, default=None)
+    benchmark_parser.add_argument("--num-samples", type=int, default=4096)
+    benchmark_parser.add_argument("--concurrency", type=int, default=512)
+    benchmark_parser.add_argument("--max-batch-size", type=int, default=32)
+    benchmark_parser.add_argument("--batch-window", type=float, default=0.01)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        import uvicorn
+
+        uvicorn.run(create_app(args.latency, args.per_sample_latency, args.rm_type), host=args.host, port=args.port)
+    else:
+        asyncio.run(
+            benchmark(
+                args.url, args.batch_url, args.num_samples, args.concurrency, args.max_batch_size, args.batch_window
+            )
+        )
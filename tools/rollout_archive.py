@@ -0,0 +1,78 @@
+"""
+Convert debug rollout data saved with `torch.save` to rollout archives, and inspect rollout archives.
+
+    python tools/rollout_archive.py convert --input rollout_data/{rollout_id}.pt --output rollout_data/{rollout_id} \
+        --rollout-ids 0 1 2
+    python tools/rollout_archive.py show --path rollout_data/{rollout_id} --rollout-id 0 --sample-index 42
+"""
+
+import json
+from argparse import ArgumentParser
+
+import torch
+
+from slime.utils.rollout_archive import RolloutArchive
+from slime.utils.types import Sample
+
+
+def convert(input_template, output_template, rollout_ids, reward_key=None):
+    for rollout_id in rollout_ids:
+        data = torch.load(open(input_template.format(rollout_id=rollout_id), "rb"))
+        samples = [Sample.from_dict(sample) for sample in data["samples"]]
+        rewards = [sample.reward if not reward_key else sample.reward[reward_key] for sample in samples]
+        output_path = output_template.format(rollout_id=rollout_id)
+        RolloutArchive.write(output_path, samples, rewards, rollout_id=data.get("rollout_id", rollout_id))
+        print(f"Converted rollout {rollout_id} with {len(samples)} samples to {output_path}")
+
+
+def show(path_template, rollout_id, sample_index=None, position=None):
+    archive = RolloutArchive(path_template.format(rollout_id=rollout_id))
+    if sample_index is None and position is None:
+        batch = archive.to_sample_batch()
+        print(
+            json.dumps(
+                {
+                    "rollout_id": archive.rollout_id,
+                    "num_samples": len(archive),
+                    "num_tokens": int(batch.token_offsets[-1]),
+                    "mean_response_length": float(batch.response_lengths.mean()) if len(batch) else 0.0,
+                    "mean_reward": float(batch.rewards.mean()) if len(batch) else 0.0,
+                },
+                indent=2,
+            )
+        )
+        return
+
+    if position is not None:
+        positions = [position]
+    else:
+        # the sample indices are saved as strings when they are not numbers.
+        key = sample_index if archive.columns["sample_indices"].dtype.kind in "U" else int(sample_index)
+        positions = archive.find(key)
+        if not positions:
+            print(f"No sample with index {sample_index} in rollout {rollout_id}")
+    for i in positions:
+        print(json.dumps(archive.get_sample(i).to_dict(), ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="convert `.pt` debug rollout data to rollout archives.")
+    convert_parser.add_argument("--input", type=str, required=True, help="path template of the `.pt` files.")
+    convert_parser.add_argument("--output", type=str, required=True, help="path template of the archives.")
+    convert_parser.add_argument("--rollout-ids", type=int, nargs="+", required=True)
+    convert_parser.add_argument("--reward-key", type=str, default=None)
+
+    show_parser = subparsers.add_parser("show", help="print the summary of an archive, or some of its samples.")
+    show_parser.add_argument("--path", type=str, required=True, help="path template of the archives.")
+    show_parser.add_argument("--rollout-id", type=int, default=0)
+    show_parser.add_argument("--sample-index", type=str, default=None, help="the `index` of the samples to print.")
+    show_parser.add_argument("--position", type=int, default=None, help="the position of the sample to print.")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.input, args.output, args.rollout_ids, args.reward_key)
+    else:
+        show(args.path, args.rollout_id, args.sample_index, args.position)
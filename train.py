@@ -16,6 +16,7 @@ def train(args):
     rollout_manager = create_rollout_manager(args, pgs["rollout"], wandb_run_id=wandb_run_id)
 
     assert args.offload and args.colocate, "Offload and colocate must be enabled"
+    assert not args.rollout_streaming, "Streaming the rollout is only supported by train_async.py."
 
     # calculate num_rollout from num_epoch
     num_rollout_per_epoch = None
@@ -43,18 +43,69 @@ def train(args):
     # always update weight first so that sglang has the loaded weights from training.
     ray.get(actor_model.async_update_weights())
 
-    # async train loop.
-    rollout_data_next_future = rollout_manager.async_generate(args.start_rollout_id)
+    # async train loop. The rollouts are generated one at a time, at most `rollout_pipeline_depth` ahead of the
+    # one being trained, and the weights are only updated between two generations.
+    data_buffer = rollout_manager.data_buffer
+    generation = None  # the (rollout_id, future) of the rollout being generated.
+    next_rollout_id = args.start_rollout_id
+    # the rollouts that can be trained, by id. When streaming, a rollout can be trained once it starts generating,
+    # and its chunks are fetched from the data buffer instead.
+    rollout_data_refs = {}
+    update_weights_pending = False
+
+    def finish_generation():
+        nonlocal generation
+        rollout_id, future = generation
+        rollout_data_ref = ray.get(future)
+        if not args.rollout_streaming:
+            rollout_data_refs[rollout_id] = rollout_data_ref
+        generation = None
+
+    def schedule(train_rollout_id):
+        # update the weights and start the next generation, if nothing is being generated.
+        nonlocal generation, next_rollout_id, update_weights_pending
+        if generation is not None:
+            return
+        if update_weights_pending:
+            ray.get(actor_model.async_update_weights())
+            update_weights_pending = False
+        if next_rollout_id < min(args.num_rollout, train_rollout_id + args.rollout_pipeline_depth + 1):
+            generation = (next_rollout_id, rollout_manager.async_generate(next_rollout_id))
+            if args.rollout_streaming:
+                rollout_data_refs[next_rollout_id] = None
+            next_rollout_id += 1
+
+    def wait_and_generate(refs, train_rollout_id):
+        # wait for `refs`, and keep generating meanwhile.
+        pending = list(refs)
+        while pending:
+            schedule(train_rollout_id)
+            if generation is None:
+                ray.get(pending)
+                return
+            done, _ = ray.wait([generation[1]] + pending, num_returns=1)
+            if generation[1] in done:
+                finish_generation()
+            pending = [ref for ref in pending if ref not in done]
+
+    num_steps_per_rollout = args.rollout_batch_size * args.n_samples_per_prompt // args.global_batch_size
     for rollout_id in range(args.start_rollout_id, args.num_rollout):
-        # Sync the last generation
-        if rollout_data_next_future is not None:
-            rollout_data_curr_ref = ray.get(rollout_data_next_future)
-
-        # Start the next rollout early.
-        if rollout_id + 1 < args.num_rollout:
-            rollout_data_next_future = rollout_manager.async_generate(rollout_id + 1)
-
-        ray.get(actor_model.async_train(rollout_id, rollout_data_curr_ref))
+        schedule(rollout_id)
+        while rollout_id not in rollout_data_refs:
+            finish_generation()
+            schedule(rollout_id)
+
+        if args.rollout_streaming:
+            # one optimizer step per chunk of global_batch_size samples.
+            rollout_data_refs.pop(rollout_id)
+            for step_id in range(num_steps_per_rollout):
+                chunk_future = data_buffer.get_chunk.remote(rollout_id, step_id)
+                wait_and_generate([chunk_future], rollout_id)
+                train_refs = actor_model.async_train(rollout_id, ray.get(chunk_future), step_offset=step_id)
+                wait_and_generate(train_refs, rollout_id)
+        else:
+            train_refs = actor_model.async_train(rollout_id, rollout_data_refs.pop(rollout_id))
+            wait_and_generate(train_refs, rollout_id)
 
         if args.save_interval is not None and (
             (rollout_id + 1) % args.save_interval == 0
@@ -62,22 +113,25 @@ def train(args):
         ):
             ray.get(actor_model.async_save_model(rollout_id))
             if args.rollout_global_dataset:
-                ray.get(rollout_manager.data_buffer.save.remote(rollout_id))
+                ray.get(data_buffer.save.remote(rollout_id))
 
         if (rollout_id + 1) % args.update_weights_interval == 0:
-            # sync generate before update weights to prevent update weight in the middle of generation
-            rollout_data_curr_ref = ray.get(rollout_data_next_future)
-            rollout_data_next_future = None
-            ray.get(actor_model.async_update_weights())
+            # the weights are updated once the current generation finishes, the ready rollouts are trained meanwhile.
+            update_weights_pending = True
 
         if args.eval_interval is not None and (
             (rollout_id + 1) % args.eval_interval == 0
             or (num_rollout_per_epoch is not None and (rollout_id + 1) % num_rollout_per_epoch == 0)
         ):
+            # evaluate the updated weights.
+            if update_weights_pending:
+                if generation is not None:
+                    finish_generation()
+                ray.get(actor_model.async_update_weights())
+                update_weights_pending = False
             eval_rollout_data_ref = ray.get(rollout_manager.async_generate(rollout_id, evaluation=True))
             ray.get(actor_model.async_eval(rollout_id, eval_rollout_data_ref))
 
-
 if __name__ == "__main__":
     args = parse_args()
     train(args)